@@ -134,18 +134,19 @@ def create_dating_schedule(person_df, n_meeting=10):
     A[np.arange(len(A)), np.arange(len(A))] = -1000
 
     # for dating at CCN
-    v, K, d = create_lp_matrix(
+    v, K, d, bounds = create_lp_matrix(
         A, 
         min_reviewers_per_paper=n_meeting, max_reviewers_per_paper=n_meeting,
         min_papers_per_reviewer=n_meeting, max_papers_per_reviewer=n_meeting
     )
-    x_sol = linprog(v, K, d)['x']
+    x_sol = linprog(v, K, d, bounds=bounds)['x']
     b = create_assignment(x_sol, A)
 
     output = []
-    for i in range(len(b)):
-        r = [list(person_df['PersonID'])[b_] for b_ in np.nonzero(b[i])[0]]
-        output.append([list(person_df.PersonID)[i], r])
+    person_ids = list(person_df['PersonID'])
+    for i, matches in enumerate(b.reviewer_lists()):
+        r = [person_ids[b_] for b_ in matches]
+        output.append([person_ids[i], r])
 
     # make optimal schedule
     schedule = nest_answer(output, format_answer(color_graph(build_line_graph(output))))
@@ -20,11 +20,10 @@ import pandas as pd
 import random
 import networkx as nx
 from itertools import chain
-from fuzzywuzzy import fuzz
 from paper_reviewer_matcher import (
     preprocess, compute_affinity,
     create_lp_matrix, linprog,
-    create_assignment
+    create_assignment, match_names, trim_affinity
 )
 from docx import Document
 
@@ -70,7 +69,7 @@ def split_exclude_string(people):
     return [p.strip() for p in people_list if p.strip() is not '']
 
 
-def create_coi_dataframe(df, people_maps, threshold=85, coreferred=True):
+def create_coi_dataframe(df, people_maps, threshold=85, coreferred=True, n_jobs=1):
     """
     For a given dataframe of for mind-match people with 
     ``full_name``, ``mindMatchExcludeList`` column, and 
@@ -83,26 +82,21 @@ def create_coi_dataframe(df, people_maps, threshold=85, coreferred=True):
     people_maps: list, list dictionary that map person id to their person_id, full_name, and affiliation
     threshold: int, fuzzy string match ratio for matching name in ``mindMatchExcludeList`` and ``full_name``
     coreferred: bool, if True, add extra conflict of interest for people who mentioned the same person
+    n_jobs: int, number of processes for fuzzy matching
 
     Output
     ======
     coi_df: dataframe, conflict of interest
     """
-    coi_list = []
-    for i, r in df.iterrows():
-        if len(r['mindMatchExcludeList']) > 0:
-            exclude_list = []
-            for exclude in r['mindMatchExcludeList']:
-                exclude_list.extend([
-                    p['person_id'] for p in people_maps if 
-                    exclude in p['full_name'] or 
-                    fuzz.ratio(p['full_name'], exclude) >= threshold or 
-                    fuzz.ratio(p['affiliation'], exclude) >= threshold
-                ])
-            exclude_list = sorted(pd.unique(exclude_list))
-            if len(exclude_list) > 0:
-                for e in exclude_list:
-                    coi_list.append([i, e])
+    owners = np.repeat(np.asarray(df.index), df['mindMatchExcludeList'].map(len))
+    excludes = [exclude for exclude_list in df['mindMatchExcludeList'] for exclude in exclude_list]
+    person_ids = np.array([p['person_id'] for p in people_maps])
+    name_pairs = match_names([p['full_name'] for p in people_maps], excludes,
+                             ratio=threshold, substring=True, n_jobs=n_jobs)
+    affiliation_pairs = match_names([p['affiliation'] for p in people_maps], excludes,
+                                    ratio=threshold, n_jobs=n_jobs)
+    pairs = np.vstack([name_pairs, affiliation_pairs])
+    coi_list = np.unique(np.column_stack([owners[pairs[:, 0]], person_ids[pairs[:, 1]]]), axis=0)
     coi_df = pd.DataFrame(coi_list, columns=['person_id', 'person_id_exclude'])
 
     # add extra co-referred COI for people who refers the same person
@@ -210,25 +204,21 @@ if __name__ == '__main__':
 
     # trimming affinity matrix to reduce problem size
     n_trim = 2
-    A_trim = []
-    for r in range(len(A)):
-        a = A[r, :]
-        a[np.argsort(a)[0:n_trim]] = 0
-        A_trim.append(a)
-    A_trim = np.vstack(A_trim)
+    A_trim = trim_affinity(A, drop=n_trim)
 
     print('Solving linear programming for Mind-Matching session...')
-    v, K, d = create_lp_matrix(A_trim, 
+    v, K, d, bounds = create_lp_matrix(A_trim, 
                                min_reviewers_per_paper=6, max_reviewers_per_paper=6,
                                min_papers_per_reviewer=6, max_papers_per_reviewer=6)
-    x_sol = linprog(v, K, d)['x']
+    x_sol = linprog(v, K, d, bounds=bounds)['x']
     b = create_assignment(x_sol, A_trim)
     print('Done!')
 
     output = []
-    for i in range(len(b)):
-        r = [list(df['person_id'])[b_] for b_ in np.nonzero(b[i])[0]]
-        output.append([list(df.person_id)[i], r])
+    person_ids = list(df['person_id'])
+    for i, matches in enumerate(b.reviewer_lists()):
+        r = [person_ids[b_] for b_ in matches]
+        output.append([person_ids[i], r])
 
     # make optimal schedule [[person_id, [match_id_1, match_id_2, ...]], ...]
     schedule = nest_answer(output, format_answer(color_graph(build_line_graph(output))))
@@ -1,11 +1,10 @@
 from glob import glob
-import numpy as np
 import pandas as pd
 import scipy.sparse as sp
 from paper_reviewer_matcher import (
     preprocess, compute_affinity,
     create_lp_matrix, linprog,
-    create_assignment
+    create_assignment, trim_affinity
 )
 
 
@@ -49,30 +48,25 @@ def assign_articles_to_reviewers(article_df, reviewer_df, people_df):
     )
     
     # trim distance that are too high
-    A_trim = []
-    for r in range(len(A)):
-        a = A[r, :]
-        a[np.argsort(a)[0:200]] = 0
-        A_trim.append(a)
-    A_trim = np.vstack(A_trim)
+    A_trim = trim_affinity(A, drop=200)
 
     # assign conflict of interest to have high negative cost
     for i, j in zip(coi_df.paper_id.tolist(), coi_df.person_id.tolist()):
         A_trim[i, j] = -1000
 
     # for CCN case, 
-    v, K, d = create_lp_matrix(A_trim, 
+    v, K, d, bounds = create_lp_matrix(A_trim, 
                                min_reviewers_per_paper=6, max_reviewers_per_paper=6,
                                min_papers_per_reviewer=4, max_papers_per_reviewer=6)
-    x_sol = linprog(v, K, d)['x']
+    x_sol = linprog(v, K, d, bounds=bounds)['x']
     b = create_assignment(x_sol, A_trim)
     reviewer_ids = list(reviewer_df.PersonID)
     reviewer_name_dict = {r['PersonID']: r['FullName'] for _, r in people_df.iterrows()} # map reviewer id to reviewer name
     assignments = []
-    for i in range(len(b)):
+    for i, reviewers in enumerate(b.reviewer_lists()):
         assignments.append([i, 
-                            [reviewer_ids[b_] for b_ in np.nonzero(b[i])[0]], 
-                            [reviewer_name_dict[reviewer_ids[b_]] for b_ in np.nonzero(b[i])[0]]])
+                            [reviewer_ids[b_] for b_ in reviewers], 
+                            [reviewer_name_dict[reviewer_ids[b_]] for b_ in reviewers]])
     assignments_df = pd.DataFrame(assignments, columns=['paper_id', 'ReviewerIDList', 'reviewer_names'])
     assignments_df['ReviewerIDList'] = assignments_df.ReviewerIDList.map(lambda e: ';'.join(str(e_) for e_ in e))
     assignments_df['reviewer_names'] = assignments_df.reviewer_names.map(lambda x: ';'.join(x))
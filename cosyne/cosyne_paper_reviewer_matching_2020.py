@@ -7,9 +7,8 @@ import scipy.sparse as sp
 from paper_reviewer_matcher import (
     preprocess, compute_affinity,
     create_lp_matrix, create_assignment,
-    linprog
+    linprog, match_names
 )
-from fuzzywuzzy import fuzz
 
 
 def find_user_ids(authors):
@@ -29,13 +28,21 @@ def clean_authors(authors):
     return re.sub(r'#(\w+)', '', authors).replace('()', '')
 
 
-def create_coi_list(authors, df):
-    cois = []
-    for i, r in df.iterrows():
-        for cl in r['CollaboratorsList']:
-            if max([fuzz.ratio(a, cl) for a in authors]) >= 80:
-                cois.append(i)
-    return cois
+def create_coi_list(authors_list, df, ratio=80, n_jobs=1):
+    """
+    For each paper's list of authors, find reviewers in ``df`` who have
+    one of the authors in their ``CollaboratorsList``
+    """
+    authors = [a for names in authors_list for a in names]
+    paper_ids = np.repeat(np.arange(len(authors_list)), [len(a) for a in authors_list])
+    collaborators = [cl for cls in df['CollaboratorsList'] for cl in cls]
+    reviewer_ids = np.repeat(np.asarray(df.index), [len(cls) for cls in df['CollaboratorsList']])
+    pairs = match_names(authors, collaborators, ratio=ratio, n_jobs=n_jobs)
+    pairs = np.unique(np.column_stack([paper_ids[pairs[:, 1]], reviewer_ids[pairs[:, 0]]]), axis=0)
+    cois = [[] for _ in range(len(authors_list))]
+    for paper_id, reviewer_id in pairs:
+        cois[paper_id].append(reviewer_id)
+    return pd.Series(cois, index=authors_list.index)
 
 
 def create_coi_author_ids(user_ids, df):
@@ -48,12 +55,12 @@ def create_coi_author_ids(user_ids, df):
 
 def create_assignment_dataframe(b, reviewer_map, paper_id_map, pool_group='a'):
     """
-    Get the assignment array, generate assignment dataframe
+    Get the assignment, generate assignment dataframe
     """
     assignments = []
-    for i in range(len(b)):
+    for i, reviewers in enumerate(b.reviewer_lists()):
         assignments.append([
-            paper_id_map[i], [reviewer_map[b_] for b_ in np.nonzero(b[i])[0]]
+            paper_id_map[i], [reviewer_map[b_] for b_ in reviewers]
         ])
     assignments_df = pd.DataFrame(assignments, columns=['PaperID', 'UserIDs'])
     n_reviewers = len(assignments_df.UserIDs.iloc[0])
@@ -109,8 +116,7 @@ if __name__ == '__main__':
     # COIs
     cois_ids = submission_df.AuthorIds.map(
         lambda x: create_coi_author_ids(x, reviewer_df))
-    cois = submission_df.AuthorsList.map(
-        lambda x: create_coi_list(x, reviewer_df))
+    cois = create_coi_list(submission_df.AuthorsList, reviewer_df, n_jobs=-1)
     cois_df = pd.DataFrame(cois + cois_ids, columns=['AuthorsList'])
     for i, r in cois_df.iterrows():
         if len(r['AuthorsList']) > 0:
@@ -119,16 +125,16 @@ if __name__ == '__main__':
 
     # assignment
     A_a, A_b = A[:, :len(reviewer_a_df)], A[:, len(reviewer_a_df):]
-    v, K, d = create_lp_matrix(A_a,
+    v, K, d, bounds = create_lp_matrix(A_a,
                                min_reviewers_per_paper=2, max_reviewers_per_paper=2,
                                min_papers_per_reviewer=10, max_papers_per_reviewer=12)
-    x_sol = linprog(v, K, d)['x']
+    x_sol = linprog(v, K, d, bounds=bounds)['x']
     b_a = create_assignment(x_sol, A_a)
 
-    v, K, d = create_lp_matrix(A_b,
+    v, K, d, bounds = create_lp_matrix(A_b,
                                min_reviewers_per_paper=2, max_reviewers_per_paper=2,
                                min_papers_per_reviewer=10, max_papers_per_reviewer=12)
-    x_sol = linprog(v, K, d)['x']
+    x_sol = linprog(v, K, d, bounds=bounds)['x']
     b_b = create_assignment(x_sol, A_b)
 
     reviewer_a_map = {i: r['UserID'] for i, r in reviewer_a_df.iterrows()}
@@ -11,29 +11,15 @@ TODO: make it as a script, add documentation on how it works
 
 import numpy as np
 import pandas as pd
-from fuzzywuzzy import fuzz
-from tqdm import tqdm
 
 from scipy.cluster.hierarchy import linkage
 import hcluster   # requires dedupe-hcluster
 from paper_reviewer_matcher import (
-    preprocess, compute_affinity
+    preprocess, compute_affinity,
+    compute_conflicts
 )
 
 
-def compute_conflicts(df):
-    """
-    Compute conflict for a given dataframe
-    """
-    cois = []
-    for i, r in tqdm(df.iterrows()):
-        exclude_list = r['conflicts'].split(';')
-        for j, r_ in df.iterrows():
-            if max([fuzz.ratio(r_['fullname'], n) for n in exclude_list]) >= 85:
-                cois.append([i, j])
-                cois.append([j, i])
-    return cois
-
 def generate_pod_numbers(n_users, n_per_group):
     """
     Generate pod numbers in sequence
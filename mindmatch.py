@@ -3,7 +3,7 @@
 """MindMatch: a script for matching people to people in the conference
 
 Usage:
-  mindmatch.py PATH [--n_match=<n_match>] [--n_trim=<n_trim>] [--output=<output>]
+  mindmatch.py PATH [--n_match=<n_match>] [--n_trim=<n_trim>] [--output=<output>] [--cache=<cache>] [--n_sample=<n_sample>] [--n_jobs=<n_jobs>]
   mindmatch.py [-h | --help]
   mindmatch.py [-v | --version]
 
@@ -15,14 +15,17 @@ Options:
   -h --help             Show documentation helps
   --version             Show version
   --n_match=<n_match>   Number of match per user
-  --n_trim=<n_trim>     Trimming parameter for distance matrix, increase to reduce problem size
+  --n_trim=<n_trim>     Trimming parameter for distance matrix, increase to reduce problem size, or auto
   --output=<output>     Output CSV file contains 'user_id' and 'match_ids' which has match ids with ; separated
+  --cache=<cache>       Directory to cache preprocessed abstracts and topics between runs
+  --n_sample=<n_sample> Only match a random sample of <n_sample> people from the file
+  --n_jobs=<n_jobs>     Number of processes to preprocess abstracts and compute conflicts
 """
 import numpy as np
 import pandas as pd
 from docopt import docopt
 from paper_reviewer_matcher import (
-    preprocess,
+    read_mindmatch_csv, set_cache,
     compute_affinity,
     perform_mindmatch,
     compute_conflicts
@@ -33,12 +36,6 @@ if __name__ == "__main__":
     arguments = docopt(__doc__, version='MindMatch 0.1.dev')
 
     file_name = arguments['PATH']
-    df = pd.read_csv(file_name).fillna('').sample(n=500).reset_index(drop=True)
-    assert 'user_id' in df.columns, "CSV file must have ``user_id`` in the columns"
-    assert 'fullname' in df.columns, "CSV file must have ``fullname`` in the columns"
-    assert 'abstracts' in df.columns, "CSV file must have ``abstracts`` in the columns"
-    assert 'conflicts' in df.columns, "CSV file must have ``conflicts`` in the columns"
-    print("Number of people in the file = {}".format(len(df)))
 
     n_match = arguments.get('--n_match')
     if n_match is None:
@@ -53,34 +50,51 @@ if __name__ == "__main__":
     if n_trim is None:
         n_trim = 0
         print('<n_trim> is set to default, this will take very long to converge for a large problem')
+    elif n_trim == 'auto':
+        print('Trimming parameter is tuned automatically')
     else:
         n_trim = int(n_trim)
         print('Trimming parameter is set to {}'.format(n_trim))
 
-    output_filename = arguments.get('output')
+    output_filename = arguments.get('--output')
     if output_filename is None:
         output_filename = 'output_match.csv'
 
+    cache_dir = arguments.get('--cache')
+    if cache_dir is not None:
+        set_cache(cache_dir)
+        print('Caching preprocessed abstracts and topics in {}'.format(cache_dir))
+
+    n_jobs = int(arguments.get('--n_jobs') or 1)
+
+    # read the file in chunks, keep only ids, names and preprocessed abstracts
+    df, abstracts = read_mindmatch_csv(file_name, n_jobs=n_jobs)
+    print("Number of people in the file = {}".format(len(df)))
+    n_sample = arguments.get('--n_sample')
+    if n_sample is not None:
+        sample = np.sort(np.random.choice(len(df), int(n_sample), replace=False))
+        df = df.iloc[sample].reset_index(drop=True)
+        abstracts = [abstracts[i] for i in sample]
+        print('Randomly select {} people from the file'.format(n_sample))
+
     # create affinity matrix and compute conflicts
-    persons_1 = list(map(preprocess, list(df['abstracts'])))
-    persons_2 = list(map(preprocess, list(df['abstracts'])))
     A = compute_affinity(
-        persons_1, persons_2,
+        abstracts, abstracts,
         n_components=30, min_df=3, max_df=0.85,
         weighting='tfidf', projection='pca'
     )
     print('Compute conflicts... (this may take a bit)')
-    cois = compute_conflicts(df, ratio=85)
+    cois = compute_conflicts(df, ratio=85, n_jobs=n_jobs)
     print('Done computing conflicts!')
 
     # perform mindmatching
     b = perform_mindmatch(A, n_trim=n_trim, n_match=n_match, cois=cois)
 
-    if (b.sum() != 0):
+    if b.nnz != 0:
         output = []
-        user_ids_map = {ri: r['user_id'] for ri, r in df.iterrows()}
-        for i in range(len(b)):
-            match_ids = [str(user_ids_map[b_]) for b_ in np.nonzero(b[i])[0]]
+        user_ids_map = dict(enumerate(df['user_id']))
+        for i, matches in enumerate(b.reviewer_lists()):
+            match_ids = [str(user_ids_map[b_]) for b_ in matches]
             output.append({
                 'user_id': user_ids_map[i],
                 'match_ids': ';'.join(match_ids)
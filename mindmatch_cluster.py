@@ -5,7 +5,7 @@ Here, we add a trick to make the problem smaller by applying spectral clustering
 apply mind-matching to each cluster.
 
 Usage:
-  mindmatch_cluster.py PATH [--n_match=<n_match>] [--n_trim=<n_trim>] [--output=<output>] [--n_clusters=<n_clusters>]
+  mindmatch_cluster.py PATH [--n_match=<n_match>] [--n_trim=<n_trim>] [--output=<output>] [--n_clusters=<n_clusters>] [--cache=<cache>] [--n_jobs=<n_jobs>]
   mindmatch_cluster.py [-h | --help]
   mindmatch_cluster.py [-v | --version]
 
@@ -20,12 +20,14 @@ Options:
   --n_clusters=<n_clusters>   Number of cluster before performing mindmatch
   --n_trim=<n_trim>         Trimming parameter for distance matrix, increase to reduce problem size
   --output=<output>         Output CSV file contains 'user_id' and 'match_ids' which has match ids with ; separated
+  --cache=<cache>           Directory to cache preprocessed abstracts and topics between runs
+  --n_jobs=<n_jobs>         Number of processes to preprocess abstracts and compute conflicts
 """
 import numpy as np
 import pandas as pd
 from docopt import docopt
 from paper_reviewer_matcher import (
-    preprocess,
+    read_mindmatch_csv, set_cache,
     compute_topics,
     perform_mindmatch,
     compute_conflicts,
@@ -37,12 +39,6 @@ if __name__ == "__main__":
     arguments = docopt(__doc__, version='MindMatch 0.1.dev')
 
     file_name = arguments['PATH']
-    df = pd.read_csv(file_name).fillna('')
-    assert 'user_id' in df.columns, "CSV file must have ``user_id`` in the columns"
-    assert 'fullname' in df.columns, "CSV file must have ``fullname`` in the columns"
-    assert 'abstracts' in df.columns, "CSV file must have ``abstracts`` in the columns"
-    assert 'conflicts' in df.columns, "CSV file must have ``conflicts`` in the columns"
-    print("Number of people in the file = {}".format(len(df)))
 
     n_match = arguments.get('--n_match')
     if n_match is None:
@@ -69,12 +65,23 @@ if __name__ == "__main__":
         n_clusters = int(n_clusters)
         print('Setting number of clusters to 4')
 
-    output_filename = arguments.get('output')
+    output_filename = arguments.get('--output')
     if output_filename is None:
         output_filename = 'output_match.csv'
 
+    cache_dir = arguments.get('--cache')
+    if cache_dir is not None:
+        set_cache(cache_dir)
+        print('Caching preprocessed abstracts and topics in {}'.format(cache_dir))
+
+    n_jobs = int(arguments.get('--n_jobs') or 1)
+
+    # read the file in chunks, keep only ids, names and preprocessed abstracts
+    df, abstracts = read_mindmatch_csv(file_name, n_jobs=n_jobs)
+    print("Number of people in the file = {}".format(len(df)))
+
     # compute topics
-    X_topic = compute_topics(list(map(preprocess, list(df['abstracts']))))
+    X_topic = compute_topics(abstracts)
     spectral_clustering = SpectralClustering(n_clusters=n_clusters, random_state=42)
     labels = spectral_clustering.fit_predict(X_topic)
     labels[0] = 3 # make some trick so that each group has even numbers, this is specific to this example
@@ -86,12 +93,12 @@ if __name__ == "__main__":
     for _, df_group in df.groupby("group"):
         X = np.vstack(df_group.topics.values) # topics
         A = calculate_affinity_distance(X, X) # calculate affinity matrix
-        cois = compute_conflicts(df_group.reset_index(drop=True)) # COIs from names
+        cois = compute_conflicts(df_group.reset_index(drop=True), n_jobs=n_jobs) # COIs from names
         b = perform_mindmatch(A, n_trim=10, n_match=6, cois=cois) # performing 
         
-        user_ids_map = {ri: r['user_id'] for ri, r in df_group.reset_index(drop=True).iterrows()}
-        for i in range(len(b)):
-            match_ids = [str(user_ids_map[b_]) for b_ in np.nonzero(b[i])[0]]
+        user_ids_map = dict(enumerate(df_group['user_id']))
+        for i, matches in enumerate(b.reviewer_lists()):
+            match_ids = [str(user_ids_map[b_]) for b_ in matches]
             output.append({
                 'user_id': user_ids_map[i],
                 'match_ids': ';'.join(match_ids)
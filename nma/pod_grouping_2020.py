@@ -4,17 +4,16 @@ import numpy as np
 import pandas as pd
 import paper_reviewer_matcher as pp
 from paper_reviewer_matcher import (
-    preprocess, compute_affinity,
-    create_lp_matrix, create_assignment
+    preprocess, compute_topics, pairwise_affinity,
+    create_lp_matrix, create_assignment,
+    timezone_distance_matrix, language_distance_matrix,
+    availability_masks, cannot_link_pairs, constrained_kmeans,
+    geo_distance_matrix, unit_sphere_coordinates, feature_embedding, landmark_mds
 )
 from scipy.cluster.hierarchy import linkage
-from sklearn.preprocessing import MinMaxScaler
 
 from itertools import product
-from tqdm import tqdm, tqdm_notebook
 
-from sklearn.manifold import MDS
-from copkmeans.cop_kmeans import cop_kmeans
 
 selected_cols = [
     'index', 'gender', 'institution', 'home_country',
@@ -102,26 +101,43 @@ def calculate_geo_distance(d1, d2, R=6373.0):
         return (d1['idx'], d2['idx'], np.nan)
 
 
-def calculate_geo_distance_matrix(df):
+def calculate_geo_distance_matrix(df, R=6373.0, dtype=np.float32, block_size=1024):
     """
-    Calculate geo distance matrix from a given dataframe
+    Calculate geo distance matrix in kilometers from a given dataframe with
+    ``geo_distance_matrix``, missing distances (missing location) are
+    filled with the mean distance
     """
-    n_users = len(df)
-    lat_lng_df = df[['idx', 'index', 'institute_longitude', 'institute_latitude']].rename(
-        columns={'institute_longitude': 'lng', 'institute_latitude': 'lat'}
+    D_lat_lng = geo_distance_matrix(
+        pd.to_numeric(df['institute_latitude'], errors='coerce'),
+        pd.to_numeric(df['institute_longitude'], errors='coerce'),
+        R=R, block_size=block_size, dtype=dtype
     )
-    lat_lng_list = lat_lng_df.to_dict(orient='records')
-    distance_df = pd.DataFrame(list(product(lat_lng_list, lat_lng_list)), columns=['loc1', 'loc2']).apply(
-        lambda r: calculate_geo_distance(r['loc1'], r['loc2']), axis=1
-    )
-    d_fill = np.nanmean([d for _, _, d in distance_df.values])
-    D_lat_lng = np.zeros((n_users, n_users))
-    for idx1, idx2, d in distance_df.values:
-        if not pd.isnull(d):
-            D_lat_lng[idx1, idx2] = d
-        else:
-            D_lat_lng[idx1, idx2] = d_fill
-    return D_lat_lng
+    D_lat_lng[np.isnan(D_lat_lng)] = np.nanmean(D_lat_lng, dtype=np.float64)
+    return reorder_matrix(D_lat_lng, df['idx'].values)
+
+
+def scale_distance_matrix(D):
+    """
+    Scale each column of distance matrix D to [0, 1] in place,
+    same as ``MinMaxScaler().fit_transform(D)``
+    """
+    D_min = D.min(axis=0)
+    D_range = D.max(axis=0) - D_min
+    D_range[D_range == 0] = 1
+    D -= D_min
+    D /= D_range
+    return D
+
+
+def reorder_matrix(D, idx):
+    """
+    Place rows and columns of D computed in dataframe order at indices ``idx``
+    """
+    if np.array_equal(idx, np.arange(len(idx))):
+        return D
+    D_idx = np.empty_like(D)
+    D_idx[np.ix_(idx, idx)] = D
+    return D_idx
 
 
 def calculate_language_distance_matrix(df):
@@ -130,33 +146,28 @@ def calculate_language_distance_matrix(df):
 
     The distance will be -0.5 if they have the same language preference
     """
-    n_users = len(df)
-    language_list = df[['idx', 'language']].to_dict(orient='records')
-    D_language = np.zeros((n_users, n_users))
-    for d1, d2 in product(language_list, language_list):
-        if (d1['language'] or '') == (d2['language'] or '') and d1['idx'] != d2['idx']:
-            D_language[d1['idx'], d2['idx']] = -0.5
-    return D_language
+    D_language = language_distance_matrix(list(df['language']), weight=-0.5)
+    return reorder_matrix(D_language, df['idx'].values)
 
 
-def calculate_timezone_distance_matrix(df):
+def timezone_embedding(timezones, second_timezones):
     """
-    Calculate timezone distance matrix from a given dataframe
+    Embedding of the timezone distance of ``timezone_distance_matrix``
+    (including the 0.3 overlap between timezone and second timezone)
+
+    The distance only depends on the (timezone, second timezone) pair so
+    MDS is applied to the distance matrix between the distinct pairs,
+    with every pair as a landmark, and each person gets the coordinates
+    of their pair. The distance is not euclidean so the embedding is
+    approximate, but pairs with an overlap stay closer than pairs without.
     """
-    n_users = len(df)
-    timezone_df = df[['idx', 'timezone', 'second_timezone']]
-    timezone_df.loc[:, 'timezone'] = timezone_df.timezone.map(
-        lambda t: remove_text_parentheses(t).split(' ')[-1]
-    )
-    timezone_df.loc[:, 'second_timezone'] = timezone_df.second_timezone.map(
-        lambda t: remove_text_parentheses(t).split(' ')[-1].replace('me', ' ')
-    )
-    timezone_list = timezone_df.to_dict(orient='records')
-    D_tz = np.zeros((n_users, n_users))
-    for d1, d2 in product(timezone_list, timezone_list):
-        idx1, idx2, tz_dist = compute_tz_distance_dict(d1, d2)
-        D_tz[idx1, idx2] = tz_dist
-    return D_tz
+    combos = pd.DataFrame({'timezone': list(timezones), 'second_timezone': list(second_timezones)}).fillna('')
+    codes = combos.groupby(['timezone', 'second_timezone'], sort=False).ngroup().values
+    uniques = combos.drop_duplicates()
+    D_combo = timezone_distance_matrix(list(uniques.timezone), list(uniques.second_timezone))
+    X_combo = landmark_mds(lambda landmarks: D_combo[:, landmarks], len(uniques),
+                           n_landmarks=len(uniques), n_components=len(uniques))
+    return X_combo[codes]
 
 
 def check_if_overlap(r1, r2,
@@ -190,72 +201,80 @@ def check_if_timezone_overlap(d1, d2):
 
 def generate_cannot_link_list(df, cols_tz=['timezone', 'second_timezone', 'third_timezone']):
     """
-    Return list of cannot link tuple between indices e.g.
-    [(1, 10), (10, 1), ...]
+    Return array of cannot link pairs between indices of df e.g.
+    [[1, 10], [10, 1], ...], people cannot link if none of their slots overlap
+    (only values containing 'Slot' are slots, see ``check_if_overlap``)
     """
-    cols = ['index', 'timezone', 'second_timezone', 'third_timezone']
-    cannot_link = []
-    for i, r1 in tqdm_notebook(df[cols].iterrows()):
-        for j, r2 in df[cols].iterrows():
-            if not check_if_overlap(r1, r2):
-                cannot_link.append((i, j))
-    return cannot_link
+    slots = [[e if 'Slot' in e else '' for e in df[c].fillna('')] for c in cols_tz]
+    cannot_link = cannot_link_pairs(availability_masks(*slots))
+    return np.asarray(df.index)[cannot_link]
 
 
 def generate_cannot_list_list(df):
     """
-    A more efficient way to generate cannot link list
+    A more efficient way to generate cannot link list, returns array of
+    (idx1, idx2) pairs of people without any common timezone
     """
-    cols_tz = ['idx', 'timezone', 'second_timezone', 'third_timezone']
-    tz_df = df[cols_tz]
-    tz_df.fillna('', inplace=True)
-    tz_df['timezone'] = tz_df.timezone.map(lambda t: remove_text_parentheses(t).split(' ')[-1].replace('me', ' '))
-    tz_df['second_timezone'] = tz_df.second_timezone.map(lambda t: remove_text_parentheses(t).split(' ')[-1].replace('me', ' '))
-    tz_df['third_timezone'] = tz_df.third_timezone.map(lambda t: remove_text_parentheses(t).split(' ')[-1].replace('me', ' '))
-    tz_list = tz_df.to_dict(orient='records')
-    tz_pair_df = pd.DataFrame(list(product(tz_list, tz_list)), columns=['tz1', 'tz2'])
-    cannot_link = list(tz_pair_df.apply(lambda r: check_if_timezone_overlap(r['tz1'], r['tz2']), axis=1).dropna())
-    return cannot_link
+    cols_tz = ['timezone', 'second_timezone', 'third_timezone']
+    slots = [
+        df[c].fillna('').map(lambda t: remove_text_parentheses(t).split(' ')[-1].replace('me', ' '))
+        for c in cols_tz
+    ]
+    cannot_link = cannot_link_pairs(availability_masks(*slots))
+    return df['idx'].values[cannot_link]
 
 
 if __name__ == '__main__':
     # starter
-    scaler = MinMaxScaler()
     df = pd.read_csv('nma_applicants.csv', index=False)
 
-    # calculate timezone distance
-    D_tz = calculate_timezone_distance_matrix(df)
-
-    # calculate geolocation distance
-    D_lat_lng = calculate_geo_distance_matrix(df)
-    D_lat_lng_scale = scaler.fit_transform(D_lat_lng)
-    D_lat_lng_scale = pd.DataFrame(D_lat_lng_scale).fillna(np.nanmean(D_lat_lng_scale)).values
-
-    # calculate topic distance between statement
-    persons_1 = list(map(preprocess, list(df['Statement'])))
-    persons_2 = list(map(preprocess, list(df['Statement'])))
-    D_statement = - compute_affinity(persons_1, persons_2,
-                                     n_components=30, min_df=2, max_df=0.8,
-                                     weighting='tfidf', projection='svd')
-    std_topic = D_statement.std()
-
-    # list of cannot link
-    cannot_link = generate_cannot_list_list(df)
-
-    # clustering
-    D_final = (D_statement) + (10 * std_topic * D_tz) + (std_topic * D_lat_lng_scale) # final distance
-    X_mds = MDS(n_components=30).fit_transform(D_final)
-    clusters_kmean, centers_kmean = cop_kmeans(dataset=X_mds, k=200, cl=cannot_link)
-    output_df = df[selected_cols]
+    # topic vectors of statements, the standard deviation of topic distance
+    # is estimated on a sample of people. The topic model used to be fitted on
+    # the statements twice (persons + persons), where min_df=2 removed no
+    # word, so min_df=1 keeps the same vocabulary with each statement once.
+    persons = list(map(preprocess, list(df['Statement'])))
+    X_topic = compute_topics(persons, n_components=30, min_df=1, max_df=0.8,
+                             weighting='tfidf', projection='svd')
+    sample = np.random.RandomState(0).choice(len(df), min(len(df), 500), replace=False)
+    std_topic = pairwise_affinity(X_topic[sample], X_topic).std()
+
+    # timezone and geolocation features
+    timezones = df.timezone.map(lambda t: remove_text_parentheses(t).split(' ')[-1])
+    second_timezones = df.second_timezone.map(
+        lambda t: remove_text_parentheses(t).split(' ')[-1].replace('me', ' ')
+    )
+    X_tz = timezone_embedding(timezones, second_timezones)
+    lat = pd.to_numeric(df['institute_latitude'], errors='coerce').values
+    lng = pd.to_numeric(df['institute_longitude'], errors='coerce').values
+    X_lat_lng = unit_sphere_coordinates(lat, lng)
+    # the geo distance was min-max scaled by the largest distance, estimated
+    # on the sample, the chord distance is close to distance / R
+    max_geo_distance = np.nanmax(geo_distance_matrix(lat[sample], lng[sample], lat, lng))
+
+    # availability of each person, people in a pod share a timezone slot
+    slots = [
+        df[c].fillna('').map(lambda t: remove_text_parentheses(t).split(' ')[-1].replace('me', ' '))
+        for c in ['timezone', 'second_timezone', 'third_timezone']
+    ]
+    masks = availability_masks(*slots)
+
+    # embedding with the same weights as the distance
+    # topic + 10 * std_topic * timezone + std_topic * geolocation
+    X_embedding = feature_embedding(
+        [X_topic, X_tz, X_lat_lng],
+        [1, 10 * std_topic, std_topic * 6373.0 / max_geo_distance]
+    )
+
+    # clustering into about 200 pods of equal sizes
+    clusters_kmean = constrained_kmeans(X_embedding, masks, pod_size=max(1, round(len(df) / 200)),
+                                        n_jobs=-1)
+    output_df = df[selected_cols].copy()
     output_df['pod_number'] = clusters_kmean
 
-    # rearrange
-    df_rearrange = []
-    pod_num = 1
-    for _, df_tz in output_df.groupby('timezone'):
-        for _, df_pod_num in df_tz.groupby('pod_number'):
-            df_pod_num['pod_number'] = pod_num
-            df_rearrange.append(df_pod_num)
-            pod_num += 1
-    df_rearrange = pd.concat(df_rearrange)[selected_cols]
+    # rearrange, number pods from 1 ordered by their most common timezone
+    # (pods are kept whole, people in a pod share a slot but not always the timezone)
+    pod_timezone = output_df.groupby('pod_number').timezone.agg(lambda t: t.mode().iloc[0])
+    pod_order = pod_timezone.sort_values(kind='stable').index
+    output_df['pod_number'] = output_df.pod_number.map(dict(zip(pod_order, range(1, len(pod_order) + 1))))
+    df_rearrange = output_df.sort_values(['pod_number'], kind='stable')[selected_cols + ['pod_number']]
     df_rearrange.to_csv('pod_matching_rearrange_mds.csv', index=False)
\ No newline at end of file
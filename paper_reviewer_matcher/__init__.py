@@ -1,14 +1,32 @@
-from .preprocess import preprocess
+from .cache import DiskCache, set_cache, get_cache
+from .preprocess import preprocess, preprocess_many
+from .reader import read_mindmatch_csv
 from .affinity import (
     compute_topics, compute_affinity,
-    calculate_affinity_distance,
-    create_lp_matrix, create_assignment
+    calculate_affinity_distance, calculate_topk_affinity, trim_affinity,
+    create_lp_matrix, create_assignment,
+    LPProblem
 )
-from .vectorizer import LogEntropyVectorizer, BM25Vectorizer
+from .distance import pairwise_affinity
+from .topic import TopicModel
+from .assignment import Assignment
+from .neighbors import NeighborIndex
+from .vectorizer import LogEntropyVectorizer, BM25Vectorizer, StreamingHashingVectorizer
 try:
     from .lp import linprog
     print("Using Google ortools library for ILP solver.")
 except:
     from scipy.optimize import linprog
     print("Using scipy for ILP solver. It may take really long to solve. Please consider install ortool (see README).")
+from .flow import flow_assignment
+from .coi import match_names, find_conflicts
+from .grouping import (
+    TIMEZONE_WEIGHTS, timezone_distance_matrix, language_distance_matrix,
+    geo_distance_matrix,
+    availability_masks, availability_classes, cannot_link_pairs,
+    availability_partitions, size_constrained_kmeans, constrained_kmeans,
+    one_hot, unit_sphere_coordinates, feature_embedding, landmark_mds
+)
+from .feasibility import check_feasibility, tune_trim
+from .reassign import reassign
 from .mindmatch import perform_mindmatch, compute_conflicts
@@ -1,17 +1,22 @@
+from collections import namedtuple
 import numpy as np
 import scipy.sparse as sp
 
-from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
-from .vectorizer import LogEntropyVectorizer, BM25Vectorizer
-from sklearn.decomposition import PCA, TruncatedSVD
-from sklearn.neighbors import NearestNeighbors
-from sklearn.metrics.pairwise import euclidean_distances, cosine_distances
+from .topic import TopicModel
+from .cache import get_cache, hash_key
+from .distance import pairwise_affinity
+from .assignment import Assignment
 
 __all__ = ["compute_topics",
            "calculate_affinity_distance",
+           "calculate_topk_affinity",
+           "trim_affinity",
            "compute_affinity",
            "create_lp_matrix",
-           "create_assignment"]
+           "create_assignment",
+           "LPProblem"]
+
+LPProblem = namedtuple('LPProblem', ['v', 'K', 'd', 'bounds'])
 
 
 def compute_topics(
@@ -23,66 +28,195 @@ def compute_topics(
     analyzer='word', token_pattern=r'\w{1,}',
     ngram_range=(1, 1),
     n_components=30,
-    stop_words='english'
+    stop_words='english',
+    algorithm='arpack',
+    n_iter=5,
+    n_oversamples=10,
+    dtype=np.float64,
+    random_state=None,
+    n_features=2 ** 18,
+    batch_size=1000
 ):
     """
-    Compute topics from a given list of ``papers``
-    """
-    if weighting == 'count':
-        model = CountVectorizer(min_df=min_df, max_df=max_df,
-                                token_pattern=token_pattern,
-                                ngram_range=ngram_range,
-                                stop_words=stop_words)
-    elif weighting == 'tfidf':
-        model = TfidfVectorizer(min_df=min_df, max_df=max_df,
-                                lowercase=lowercase, norm=norm,
-                                token_pattern=token_pattern,
-                                ngram_range=ngram_range,
-                                use_idf=True, smooth_idf=True, sublinear_tf=True,
-                                stop_words=stop_words)
-    elif weighting == 'entropy':
-        model = LogEntropyVectorizer(min_df=min_df, max_df=max_df,
-                                     lowercase=lowercase,
-                                     token_pattern=token_pattern,
-                                     ngram_range=ngram_range,
-                                     stop_words=stop_words)
-    elif weighting == 'bm25':
-        model = BM25Vectorizer(min_df=min_df, max_df=max_df,
-                               lowercase=lowercase,
-                               token_pattern=token_pattern,
-                               ngram_range=ngram_range,
-                               stop_words=stop_words)
-    else:
-        print("select weighting scheme from ['count', 'tfidf', 'entropy', 'bm25']")
+    Compute topics from a given list of ``papers``,
+    see ``TopicModel`` to keep the fitted model and transform new papers
 
-    X = model.fit_transform(papers) # weighting matrix
+    Use algorithm='randomized' (with ``n_iter`` power iterations and
+    ``n_oversamples`` extra vectors) and dtype=np.float32 for large corpora,
+    set ``random_state`` for reproducible topics
 
-    # topic modeling
-    if projection == 'svd':
-        topic_model = TruncatedSVD(n_components=n_components, algorithm='arpack')
-        X_topic = topic_model.fit_transform(X)
-    elif projection == 'pca':
-        topic_model = PCA(n_components=n_components)
-        X_topic = topic_model.fit_transform(X.todense())
-    else:
-        print("select projection from ['svd', 'pca']")
+    With weighting='hashing', ``papers`` can also be a callable that returns
+    a new generator of papers, topics are then computed in batches of
+    ``batch_size`` papers on ``n_features`` hashed features in bounded memory
+
+    If the cache is enabled (see ``set_cache``), topic vectors are stored
+    on disk and reused for the same papers and parameters
+    (papers given as a callable are not cached)
+    """
+    cache = get_cache() if not callable(papers) else None
+    if cache is not None:
+        key = hash_key('compute_topics', weighting, projection, min_df, max_df,
+                       lowercase, norm, token_pattern, ngram_range,
+                       n_components, stop_words, algorithm, n_iter, n_oversamples,
+                       np.dtype(dtype).name, random_state, n_features, batch_size, list(papers))
+        X_topic = cache.get_array(key)
+        if X_topic is not None:
+            return np.array(X_topic)
+
+    topic_model = TopicModel(
+        weighting=weighting,
+        projection=projection,
+        min_df=min_df, max_df=max_df,
+        lowercase=lowercase, norm=norm,
+        token_pattern=token_pattern,
+        ngram_range=ngram_range,
+        n_components=n_components,
+        stop_words=stop_words,
+        algorithm=algorithm,
+        n_iter=n_iter,
+        n_oversamples=n_oversamples,
+        dtype=dtype,
+        random_state=random_state,
+        n_features=n_features,
+        batch_size=batch_size
+    )
+    X_topic = topic_model.fit_transform(papers)
+    if cache is not None:
+        cache.set_array(key, X_topic)
     return X_topic
 
 
-def calculate_affinity_distance(X1, X2, distance: str = "euclidean"):
+def calculate_affinity_distance(X1, X2, distance: str = "euclidean",
+                                dtype=np.float64, n_jobs=1,
+                                block_size=None, out=None):
     """
     Calculate affinity matrix between matrix X1 and X2
+
+    The matrix is computed in row blocks using ``pairwise_affinity``,
+    use dtype=np.float32 and n_jobs > 1 (or -1 for all processors)
+    for large matrices and ``out`` to write into a given array or np.memmap
     """
-    if distance == 'euclidean':
-        D = - euclidean_distances(X1, X2) # dense affinity matrix
-    elif distance == 'cosine':
-        D = - cosine_distances(X1, X2) # dense affinity matrix
-    else:
-        D = None
+    if distance not in ('euclidean', 'cosine'):
         print("Distance function can only be selected from `euclidean` or `cosine`")
+        return None
+    D = pairwise_affinity(X1, X2, distance=distance, dtype=dtype,
+                          n_jobs=n_jobs, block_size=block_size, out=out) # dense affinity matrix
     return D
 
 
+def _top_indices(S, k, axis=1):
+    """
+    Indices of the k largest values of S along a given axis (unordered)
+    """
+    if k >= S.shape[axis]:
+        idx = np.arange(S.shape[axis])
+        return np.broadcast_to(idx[None, :] if axis == 1 else idx[:, None], S.shape)
+    return np.take(np.argpartition(-S, k - 1, axis=axis), np.arange(k), axis=axis)
+
+
+def trim_affinity(A, keep: int = None, drop: int = None, axis: int = 1,
+                  sparse: bool = False, min_column_coverage: int = 0):
+    """
+    Trim affinity matrix A to reduce the size of the assignment problem,
+    trimmed entries are set to zero (not considered by the solvers)
+
+    All rows (or columns) are trimmed at once with ``np.argpartition``,
+    A itself is not modified.
+
+    Parameters
+    ----------
+    A: ndarray, (n_papers, n_reviewers) affinity matrix
+    keep: int, number of highest affinities to keep along ``axis``
+    drop: int, number of lowest affinities to drop along ``axis``
+        (e.g. ``n_trim``), give either ``keep`` or ``drop``
+    axis: int, 1 to trim each row (paper), 0 to trim each column (reviewer)
+    sparse: bool, if True, return a scipy.sparse.csr_matrix of kept entries
+    min_column_coverage: int, also keep the ``min_column_coverage`` highest
+        affinities along the other axis (e.g. of each reviewer) so that
+        every column keeps enough candidates for the problem to stay feasible
+
+    Returns
+    -------
+    A_trim: ndarray or scipy.sparse.csr_matrix, trimmed affinity matrix
+    """
+    if (keep is None) == (drop is None):
+        raise ValueError("Give either ``keep`` or ``drop``")
+    A = np.asarray(A)
+    n = A.shape[axis]
+    keep = int(np.clip(keep if keep is not None else n - drop, 0, n))
+
+    mask = np.zeros(A.shape, dtype=bool)
+    if keep > 0:
+        np.put_along_axis(mask, _top_indices(A, keep, axis=axis), True, axis=axis)
+    if min_column_coverage > 0:
+        other = 1 - axis
+        m = min(min_column_coverage, A.shape[other])
+        np.put_along_axis(mask, _top_indices(A, m, axis=other), True, axis=other)
+
+    if sparse:
+        rows, cols = np.nonzero(mask)
+        return sp.csr_matrix((A[rows, cols], (rows, cols)), shape=A.shape)
+    return np.where(mask, A, 0)
+
+
+def calculate_topk_affinity(X1, X2, top_k=200, distance: str = "euclidean",
+                            min_per_column=0, block_size=1024,
+                            dtype=np.float64, n_jobs=1):
+    """
+    Calculate sparse affinity matrix between matrix X1 and X2, keeping
+    only the ``top_k`` highest affinities (closest rows of X2) for each row of X1
+
+    The distances are computed in blocks of ``block_size`` rows of X1 so that
+    the dense (n1, n2) matrix is never materialized.
+
+    Parameters
+    ----------
+    X1: ndarray, (n1, n_features) e.g. paper vectors
+    X2: ndarray, (n2, n_features) e.g. reviewer vectors
+    top_k: int, number of affinities to keep for each row of X1
+    distance: str, either 'euclidean' or 'cosine' distance
+    min_per_column: int, also keep the ``min_per_column`` highest affinities
+        of each column so that every row of X2 has at least
+        ``min_per_column`` candidates, default 0
+    block_size: int, number of rows of X1 to compute at a time
+    dtype, n_jobs: see ``calculate_affinity_distance``
+
+    Returns
+    -------
+    A: scipy.sparse.csr_matrix, (n1, n2) sparse affinity matrix
+    """
+    n1, n2 = X1.shape[0], X2.shape[0]
+    rows, cols, values = [], [], []
+    col_rows = np.full((min(min_per_column, n1), n2), -1)
+    col_values = np.full((min(min_per_column, n1), n2), -np.inf)
+    for start in range(0, n1, block_size):
+        S = calculate_affinity_distance(X1[start: start + block_size], X2, distance=distance,
+                                        dtype=dtype, n_jobs=n_jobs)
+        block_rows = np.arange(start, start + len(S))
+        idx = _top_indices(S, top_k, axis=1)
+        rows.append(np.repeat(block_rows, idx.shape[1]))
+        cols.append(idx.ravel())
+        values.append(np.take_along_axis(S, idx, axis=1).ravel())
+
+        if min_per_column > 0:
+            S_col = np.vstack([col_values, S])
+            R_col = np.vstack([col_rows, np.broadcast_to(block_rows[:, None], S.shape)])
+            idx = _top_indices(S_col, len(col_values), axis=0)
+            col_values = np.take_along_axis(S_col, idx, axis=0)
+            col_rows = np.take_along_axis(R_col, idx, axis=0)
+
+    keep = col_rows >= 0
+    rows.append(col_rows[keep])
+    cols.append(np.broadcast_to(np.arange(n2), col_rows.shape)[keep])
+    values.append(col_values[keep])
+    rows, cols, values = map(np.concatenate, (rows, cols, values))
+
+    # remove entries selected both by row and by column
+    _, unique_idx = np.unique(rows * n2 + cols, return_index=True)
+    A = sp.csr_matrix((values[unique_idx], (rows[unique_idx], cols[unique_idx])), shape=(n1, n2))
+    return A
+
+
 def compute_affinity(papers, reviewers,
                      weighting='tfidf',
                      projection='svd',
@@ -92,7 +226,13 @@ def compute_affinity(papers, reviewers,
                      token_pattern=r'\w{1,}',
                      ngram_range=(1, 1),
                      n_components=30,
-                     stop_words='english'):
+                     stop_words='english',
+                     top_k=None,
+                     min_per_column=0,
+                     dtype=np.float64,
+                     n_jobs=1,
+                     topic_model=None,
+                     index=None):
     """
     Create affinity matrix (or distance matrix)
     from given list of papers' abstract and reviewers' abstract
@@ -102,35 +242,81 @@ def compute_affinity(papers, reviewers,
     papers: list, list of string (incoming paper for the conference)
     reviewers: list, list of string from reviewers (e.g. paper that they prefer)
     weighting: str, weighting scheme for count vector matrix
-        this can be ('count', 'tfidf', 'entropy', 'bm25')
+        this can be ('count', 'tfidf', 'entropy', 'bm25', 'hashing')
     projection: str, either 'svd' or 'pca' for topic modeling
     distance: str, either 'euclidean' or 'cosine' distance
+    top_k: int, if given, keep only ``top_k`` highest affinities of each paper
+        and return a sparse matrix, see ``calculate_topk_affinity``
+    min_per_column: int, with ``top_k``, keep at least ``min_per_column``
+        highest affinities of each reviewer (also with ``index``)
+    dtype: numpy dtype to compute the affinity matrix, e.g. np.float32
+        to halve the memory for large problems
+    n_jobs: int, number of threads to compute the affinity matrix
+    topic_model: TopicModel, if given and already fitted, project papers and
+        reviewers with it instead of fitting a new model (weighting, projection
+        and other topic parameters are then ignored). If given but not fitted,
+        it is fitted on papers + reviewers and can be reused afterward.
+    index: NeighborIndex, with ``top_k``, find the ``top_k`` closest reviewers
+        of each paper with this index instead of computing all distances
+        (``distance`` of the index is used). If not fitted, it is fitted on
+        the reviewer vectors and can be saved to only query it afterward.
 
     Returns
     -------
     A: ndarray, affinity array from given papers and reviewers
+        or scipy.sparse.csr_matrix if ``top_k`` is given
     """
     n_papers = len(papers)
 
-    X_topic = compute_topics(
-        papers + reviewers,
-        weighting=weighting,
-        projection=projection,
-        min_df=min_df, max_df=max_df,
-        lowercase=lowercase, norm=norm,
-        token_pattern=token_pattern,
-        ngram_range=ngram_range,
-        n_components=n_components,
-        stop_words=stop_words
-    )
+    if topic_model is None:
+        X_topic = compute_topics(
+            papers + reviewers,
+            weighting=weighting,
+            projection=projection,
+            min_df=min_df, max_df=max_df,
+            lowercase=lowercase, norm=norm,
+            token_pattern=token_pattern,
+            ngram_range=ngram_range,
+            n_components=n_components,
+            stop_words=stop_words
+        )
+    elif topic_model.topic_model is None:
+        X_topic = topic_model.fit_transform(papers + reviewers)
+    else:
+        X_topic = topic_model.transform(papers + reviewers)
 
     # compute affinity matrix
     paper_vectors = X_topic[:n_papers, :]
     reviewer_vectors = X_topic[n_papers:, :]
-    A = calculate_affinity_distance(paper_vectors, reviewer_vectors, distance=distance)
+    if top_k is not None and index is not None:
+        if index.n_samples_ is None:
+            index.fit(reviewer_vectors)
+        A = index.candidate_graph(paper_vectors, top_k=top_k, min_per_column=min_per_column)
+    elif top_k is not None:
+        A = calculate_topk_affinity(paper_vectors, reviewer_vectors, top_k=top_k,
+                                    distance=distance, min_per_column=min_per_column,
+                                    dtype=dtype, n_jobs=n_jobs)
+    else:
+        A = calculate_affinity_distance(paper_vectors, reviewer_vectors, distance=distance,
+                                        dtype=dtype, n_jobs=n_jobs)
     return A
 
 
+def _edges(A):
+    """
+    Return row indices, column indices and values of nonzero entries in A,
+    where A can be either a dense array or a scipy sparse matrix
+    """
+    if sp.issparse(A):
+        A = sp.coo_matrix(A.tocsr())
+        A.sum_duplicates()
+        nonzero = A.data != 0
+        return A.row[nonzero], A.col[nonzero], A.data[nonzero].astype(float)
+    i, j = A.nonzero()
+    v = np.asarray(A[i, j], dtype=float).ravel()
+    return i, j, v
+
+
 def create_lp_matrix(A, min_reviewers_per_paper=0, max_reviewers_per_paper=10,
                         min_papers_per_reviewer=0, max_papers_per_reviewer=10):
     """
@@ -145,51 +331,57 @@ def create_lp_matrix(A, min_reviewers_per_paper=0, max_reviewers_per_paper=10,
 
     This problem can be reformulate as
         maximize A.T * b
-        subject to K * b <= d
-        where K = [N_p; N_r; I; -I] and d = [c_p, c_r, 1, 0]
+        subject to K * b <= d, 0 <= b <= 1
+        where K = [N_p; N_r; -N_p; -N_r] and d = [c_p, c_r, -m_p, -m_r]
 
     where A is an affinity matrix (e.g. topic distance matrix)
-          N is node edge adjacency matrix, N = [N_p; N_r; I; -I]
-          d is column constraint vector, d = [c_p, c_r, 1, 0]
+          N is node edge adjacency matrix, one row per paper and per reviewer
+          d is constraint vector, m_p and m_r are the minimum number of
+          reviewers per paper and papers per reviewer
+          b <= 1 and b >= 0 are given as variable bounds
+          instead of extra rows of K
+
+    The constraint matrix K is built directly in CSR format from
+    the edge indices of A, one nonzero per edge and constraint block.
+
+    Returns
+    -------
+    LPProblem: namedtuple of (v, K, d, bounds) where v is the affinity
+        of each edge, K is a ``scipy.sparse.csr_matrix``, d is the constraint
+        vector and bounds is the (lower, upper) bound of every variable
 
     Reference
     ---------
     Taylor, Camillo J. "On the optimal assignment of conference papers to reviewers." (2008).
     """
     n_papers, n_reviewers = A.shape
-    n_edges = np.count_nonzero(A)
+    n_nodes = n_papers + n_reviewers
+    i, j, v = _edges(A)
+    n_edges = len(v)
 
-    i, j = A.nonzero()
-    v = A[i, j]
-
-    N_e = sp.dok_matrix((n_papers + n_reviewers, n_edges), dtype=np.float)
-    N_e[i, range(n_edges)] = 1
-    N_e[j + n_papers, range(n_edges)] = 1
-
-    N_p = sp.dok_matrix((n_papers, n_edges), dtype=np.int)
-    N_p[i, range(n_edges)] = -1
-
-    N_r = sp.dok_matrix((n_reviewers, n_edges), dtype=np.int)
-    N_r[j, range(n_edges)] = -1
-
-    K = sp.vstack([N_e, N_p, N_r, sp.identity(n_edges), -sp.identity(n_edges)])
+    edges = np.arange(n_edges)
+    rows = np.concatenate([i, j + n_papers, i + n_nodes, j + n_papers + n_nodes])
+    cols = np.tile(edges, 4)
+    data = np.concatenate([np.ones(2 * n_edges), -np.ones(2 * n_edges)])
+    K = sp.csr_matrix((data, (rows, cols)), shape=(2 * n_nodes, n_edges))
 
-    d = [max_reviewers_per_paper] * n_papers + [max_papers_per_reviewer] * n_reviewers + \
-        [-min_reviewers_per_paper] * n_papers + [-min_papers_per_reviewer] * n_reviewers + \
-        [1] * n_edges + [0] * n_edges
-    d = np.atleast_2d(d).T # column constraint vector
-
-    return v, K, d
+    d = np.concatenate([
+        np.full(n_papers, max_reviewers_per_paper, dtype=float),
+        np.full(n_reviewers, max_papers_per_reviewer, dtype=float),
+        np.full(n_papers, -min_reviewers_per_paper, dtype=float),
+        np.full(n_reviewers, -min_papers_per_reviewer, dtype=float)
+    ])
+    return LPProblem(v, K, d, (0, 1))
 
 
 def create_assignment(x_sol, A):
     """
     Given a solution from linear programming problem for paper assignments
-    with affinity matrix A, produce the actual assignment matrix b
+    with affinity matrix A, produce the assignment b
+
+    A can be either a dense array or a scipy sparse matrix,
+    b is an ``Assignment``, use ``b.toarray()`` for the dense assignment matrix
     """
-    n_papers, n_reviewers = A.shape
-    i, j = A.nonzero()
+    i, j, v = _edges(A)
     t = np.array(x_sol > 0.5).flatten()
-    b = np.zeros((n_papers, n_reviewers))
-    b[i[t], j[t]] = 1
-    return b
+    return Assignment(i[t], j[t], A.shape, affinity=v[t])
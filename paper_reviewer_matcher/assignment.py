@@ -0,0 +1,110 @@
+import numpy as np
+import scipy.sparse as sp
+
+__all__ = ["Assignment"]
+
+
+class Assignment:
+    """
+    Result of a paper-reviewer assignment stored as index arrays
+    of the assigned (paper, reviewer) pairs instead of a dense matrix
+
+    Pairs are sorted by paper then reviewer, so per-paper lists, loads and
+    total affinity are computed in O(number of assignments).
+
+    Parameters
+    ----------
+    papers: array, paper (row) index of each assigned pair
+    reviewers: array, reviewer (column) index of each assigned pair
+    shape: tuple, (n_papers, n_reviewers) shape of the affinity matrix
+    affinity: array, affinity of each assigned pair, optional
+    feasible: bool, False if the solver found the problem infeasible, so an
+        infeasible problem can be told apart from an empty optimal assignment
+
+    Example
+    -------
+    >> b = create_assignment(x_sol, A)
+    >> for i, reviewers in enumerate(b.reviewer_lists()):
+    >>     print(paper_ids[i], [reviewer_ids[j] for j in reviewers])
+    >> b.reviewer_loads(), b.total_affinity()
+    """
+    def __init__(self, papers, reviewers, shape, affinity=None, feasible=True):
+        papers = np.asarray(papers, dtype=np.int64)
+        reviewers = np.asarray(reviewers, dtype=np.int64)
+        order = np.lexsort((reviewers, papers))
+        self.papers = papers[order]
+        self.reviewers = reviewers[order]
+        self.affinity = np.asarray(affinity, dtype=np.float64)[order] if affinity is not None else None
+        self.shape = tuple(shape)
+        self.feasible = feasible
+        self._paper_indptr = np.searchsorted(self.papers, np.arange(self.shape[0] + 1))
+
+    @property
+    def nnz(self):
+        """Number of assigned pairs"""
+        return len(self.papers)
+
+    def sum(self):
+        """Number of assigned pairs, same as the sum of the dense assignment matrix"""
+        return self.nnz
+
+    def reviewers_of(self, paper):
+        """Reviewer indices assigned to a given paper index"""
+        return self.reviewers[self._paper_indptr[paper]: self._paper_indptr[paper + 1]]
+
+    def papers_of(self, reviewer):
+        """Paper indices assigned to a given reviewer index"""
+        return self.papers[self.reviewers == reviewer]
+
+    def reviewer_lists(self):
+        """List of assigned reviewer indices of each paper"""
+        return np.split(self.reviewers, self._paper_indptr[1:-1])
+
+    def paper_lists(self):
+        """List of assigned paper indices of each reviewer"""
+        order = np.argsort(self.reviewers, kind='stable')
+        indptr = np.searchsorted(self.reviewers[order], np.arange(self.shape[1] + 1))
+        return np.split(self.papers[order], indptr[1:-1])
+
+    def paper_loads(self):
+        """Number of reviewers assigned to each paper"""
+        return np.diff(self._paper_indptr)
+
+    def reviewer_loads(self):
+        """Number of papers assigned to each reviewer"""
+        return np.bincount(self.reviewers, minlength=self.shape[1])
+
+    def total_affinity(self, A=None):
+        """
+        Sum of affinities of the assigned pairs, from the affinity
+        matrix ``A`` if given or from the affinities stored at creation
+        """
+        if A is not None:
+            if sp.issparse(A):
+                return float(np.asarray(sp.csr_matrix(A)[self.papers, self.reviewers]).sum())
+            return float(np.asarray(A)[self.papers, self.reviewers].sum())
+        if self.affinity is None:
+            raise ValueError("Affinity of the assigned pairs is not stored, pass the affinity matrix A")
+        return float(self.affinity.sum())
+
+    def tocoo(self):
+        return sp.coo_matrix((np.ones(self.nnz), (self.papers, self.reviewers)), shape=self.shape)
+
+    def tocsr(self):
+        """Sparse assignment matrix of ones, (n_papers, n_reviewers)"""
+        return sp.csr_matrix((np.ones(self.nnz), self.reviewers, self._paper_indptr), shape=self.shape)
+
+    def toarray(self):
+        """Dense assignment matrix b of ones, (n_papers, n_reviewers)"""
+        b = np.zeros(self.shape)
+        b[self.papers, self.reviewers] = 1
+        return b
+
+    def __array__(self, dtype=None, copy=None):
+        b = self.toarray()
+        return b if dtype is None else b.astype(dtype)
+
+    def __repr__(self):
+        if not self.feasible:
+            return "Assignment(shape={}, infeasible)".format(self.shape)
+        return "Assignment(shape={}, nnz={})".format(self.shape, self.nnz)
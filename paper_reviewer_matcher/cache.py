@@ -0,0 +1,201 @@
+import os
+import time
+import atexit
+import sqlite3
+import weakref
+import hashlib
+import numpy as np
+
+__all__ = ["DiskCache", "set_cache", "get_cache", "hash_key"]
+
+_cache = None
+
+
+def hash_key(*parts):
+    """
+    Content address of a list of parameters and documents, each part
+    is either a string, a list of strings or any value with a stable ``repr``
+    """
+    h = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, (list, tuple)) and all(isinstance(p, str) for p in part):
+            h.update(b'L%d\x00' % len(part))
+            for p in part:
+                h.update(p.encode('utf-8', 'surrogatepass'))
+                h.update(b'\x00')
+        else:
+            h.update(repr(part).encode('utf-8', 'surrogatepass'))
+            h.update(b'\x01')
+    return h.hexdigest()
+
+
+class DiskCache:
+    """
+    Content-addressed on-disk cache for preprocessed text and topic vectors
+
+    Text values are stored in an SQLite index and arrays are stored as ``.npy``
+    files next to it (loaded back as read-only memory map). The least recently
+    used entries are evicted once the total size exceeds ``max_size`` bytes,
+    down to ``low_water * max_size`` bytes.
+
+    Parameters
+    ----------
+    directory: str, directory to store the cache
+    max_size: int, maximum size of the cache in bytes, default 1 GB
+    low_water: float, fraction of ``max_size`` the cache is reduced to
+        when it is full, default 0.9
+    evict_batch: int, number of entries read at a time during eviction
+    touch_batch: int, access times of cache hits are kept in memory and
+        written in one transaction every ``touch_batch`` hits, before
+        eviction and at exit
+    """
+    def __init__(self, directory, max_size=2 ** 30, low_water=0.9, evict_batch=256,
+                 touch_batch=1024):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_size = max_size
+        self.low_water = low_water
+        self.evict_batch = evict_batch
+        self.touch_batch = touch_batch
+        self._accessed = {}
+        self.connection = sqlite3.connect(os.path.join(directory, 'index.sqlite'),
+                                          isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=OFF')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'key TEXT PRIMARY KEY, value TEXT, is_array INTEGER, '
+            'size INTEGER, last_access REAL)'
+        )
+        self.connection.execute(
+            'CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)'
+        )
+        self.size = self.connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        atexit.register(_flush_cache, weakref.ref(self))
+
+    def _array_path(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+    def _touch(self, key):
+        self._accessed[key] = time.time()
+        if len(self._accessed) >= self.touch_batch:
+            self.flush()
+
+    def _write_access_times(self):
+        self.connection.executemany('UPDATE entries SET last_access = ? WHERE key = ?',
+                                    [(t, key) for key, t in self._accessed.items()])
+        self._accessed = {}
+
+    def flush(self):
+        """
+        Write the access times of cache hits kept in memory
+        """
+        if self._accessed:
+            self.connection.execute('BEGIN')
+            self._write_access_times()
+            self.connection.execute('COMMIT')
+
+    def _insert(self, key, value, is_array, size):
+        row = self.connection.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+        self.connection.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                                (key, value, is_array, size, time.time()))
+        self.size += size - (row[0] if row is not None else 0)
+        if self.size > self.max_size:
+            self.evict()
+
+    def get_text(self, key):
+        """
+        Return cached text for a given key or None if it is not in the cache
+        """
+        row = self.connection.execute('SELECT value FROM entries WHERE key = ? AND is_array = 0',
+                                      (key,)).fetchone()
+        if row is None:
+            return None
+        self._touch(key)
+        return row[0]
+
+    def set_text(self, key, value):
+        self._insert(key, value, 0, len(value.encode('utf-8', 'surrogatepass')))
+
+    def get_array(self, key):
+        """
+        Return cached array (read-only memory map) for a given key
+        or None if it is not in the cache
+        """
+        row = self.connection.execute('SELECT key FROM entries WHERE key = ? AND is_array = 1',
+                                      (key,)).fetchone()
+        if row is None or not os.path.exists(self._array_path(key)):
+            return None
+        self._touch(key)
+        return np.load(self._array_path(key), mmap_mode='r')
+
+    def set_array(self, key, value):
+        path = self._array_path(key)
+        np.save(path, np.asarray(value))
+        self._insert(key, None, 1, os.path.getsize(path))
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache fits in
+        ``low_water * max_size`` so that eviction does not run on every insert
+        """
+        target = int(self.low_water * self.max_size)
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            self._write_access_times()
+            # recompute the size in the transaction, other processes may share the cache
+            size = connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+            while size > target:
+                rows = connection.execute(
+                    'SELECT key, is_array, size FROM entries ORDER BY last_access LIMIT ?',
+                    (self.evict_batch,))
+                removed = []
+                for key, is_array, entry_size in rows:
+                    if size <= target:
+                        break
+                    if is_array and os.path.exists(self._array_path(key)):
+                        os.remove(self._array_path(key))
+                    removed.append((key,))
+                    size -= entry_size
+                rows.close()
+                if not removed:
+                    break
+                connection.executemany('DELETE FROM entries WHERE key = ?', removed)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        self.size = size
+
+
+def _flush_cache(cache_ref):
+    cache = cache_ref()
+    if cache is not None:
+        cache.flush()
+
+
+def set_cache(directory=None, max_size=2 ** 30, low_water=0.9, evict_batch=256,
+              touch_batch=1024):
+    """
+    Enable the on-disk cache used by ``preprocess`` and ``compute_topics``
+    in a given ``directory``, use ``set_cache(None)`` to disable it,
+    see ``DiskCache`` for the other parameters
+    """
+    global _cache
+    if _cache is not None:
+        _cache.flush()
+    if directory is not None:
+        _cache = DiskCache(directory, max_size=max_size, low_water=low_water,
+                           evict_batch=evict_batch, touch_batch=touch_batch)
+    else:
+        _cache = None
+    return _cache
+
+
+def get_cache():
+    """
+    Return the current ``DiskCache`` or None if caching is disabled
+    """
+    return _cache
@@ -0,0 +1,161 @@
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from fuzzywuzzy import fuzz
+
+__all__ = ["match_names", "find_conflicts"]
+
+
+def _bigrams(text):
+    return Counter(text[k: k + 2] for k in range(len(text) - 1))
+
+
+class _BigramIndex:
+    """
+    Inverted index from character bigrams to names, used to find candidate
+    names that can reach a given ``fuzz.ratio`` threshold with a query
+
+    ``fuzz.ratio`` is 100 * 2M / T where M is the number of matching characters
+    and T is the total length of both strings. Matching characters are grouped
+    in at most 1 + T - 2M blocks contiguous in both strings, so the two strings
+    share at least M - (1 + T - 2M) = 3M - T - 1 bigrams. Since M is also
+    bounded by the shorter string, names that fail either bound can never
+    reach the threshold and are skipped without calling ``fuzz.ratio``.
+    """
+    def __init__(self, names):
+        self.names = list(names)
+        self.lengths = np.array([len(n) for n in self.names])
+        vocabulary, postings = {}, []
+        for idx, name in enumerate(self.names):
+            for bigram, count in _bigrams(name).items():
+                postings.append((vocabulary.setdefault(bigram, len(vocabulary)), idx, count))
+        postings = np.array(postings, dtype=np.int64).reshape(-1, 3)
+        postings = postings[np.argsort(postings[:, 0], kind='stable')]
+        self.vocabulary = vocabulary
+        self.indptr = np.searchsorted(postings[:, 0], np.arange(len(vocabulary) + 1))
+        self.name_ids = postings[:, 1]
+        self.counts = postings[:, 2]
+
+    def candidates(self, query, ratio, substring=False):
+        """
+        Indices of names that may have ``fuzz.ratio(name, query) >= ratio``
+        or, if ``substring`` is True, that may contain the query
+        """
+        if len(query) == 0:
+            return np.flatnonzero(self.lengths == 0) if not substring else np.arange(len(self.names))
+        shared = np.zeros(len(self.names), dtype=np.int64)
+        for bigram, count in _bigrams(query).items():
+            b = self.vocabulary.get(bigram)
+            if b is not None:
+                sl = slice(self.indptr[b], self.indptr[b + 1])
+                shared[self.name_ids[sl]] += np.minimum(self.counts[sl], count)
+        # smallest ratio that rounds up to the threshold
+        rho = (ratio - 0.5) / 100
+        total = len(query) + self.lengths
+        is_candidate = (2 * np.minimum(len(query), self.lengths) >= rho * total - 1e-9) & \
+            (shared >= 1.5 * rho * total - total - 1 - 1e-9)
+        if substring:
+            # a substring shares all of its bigrams with the name
+            is_candidate |= (self.lengths >= len(query)) & (shared >= len(query) - 1)
+        return np.flatnonzero(is_candidate)
+
+    def match(self, query, ratio, substring=False):
+        """
+        Indices of names with ``fuzz.ratio(name, query) >= ratio``
+        or, if ``substring`` is True, that contain the query
+        """
+        return [j for j in self.candidates(query, ratio, substring=substring)
+                if (substring and query in self.names[j]) or
+                fuzz.ratio(self.names[j], query) >= ratio]
+
+
+_worker_index = None
+
+
+def _init_worker(names):
+    global _worker_index
+    _worker_index = _BigramIndex(names)
+
+
+def _match_chunk(queries, ratio, substring):
+    return [_worker_index.match(query, ratio, substring=substring) for query in queries]
+
+
+def match_names(names, queries, ratio: int = 85, substring: bool = False,
+                n_jobs: int = 1, chunksize: int = 500):
+    """
+    Find all pairs of query and name that have fuzzy matching ratio
+    ``fuzz.ratio(name, query) >= ratio``
+
+    Names are indexed once by their character bigrams and ``fuzz.ratio``
+    is only computed for candidate pairs that can reach the threshold,
+    so the result is identical to comparing all pairs.
+
+    With ``n_jobs`` > 1, unique queries are split into chunks of ``chunksize``
+    and matched in a process pool. Each worker only receives the list of names
+    (to build its own index) and its chunks of queries.
+
+    Parameters
+    ==========
+    names: list, list of names to match against e.g. full names of attendees
+    queries: list, list of names to look up e.g. names in the conflict lists
+    ratio: int, Fuzzy matching ratio, 100 mean exact match, 85 allow some errors
+    substring: bool, if True, also match names that contain the query
+    n_jobs: int, number of processes, -1 to use all processors
+    chunksize: int, number of unique queries sent to a process at a time
+
+    Output
+    ======
+    pairs: ndarray, (n_pairs, 2) array of (query index, name index)
+        sorted by query index then name index
+    """
+    names = list(names)
+    unique_queries = list(dict.fromkeys(queries))
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = os.cpu_count() or 1
+
+    if n_jobs == 1 or len(unique_queries) <= chunksize:
+        index = _BigramIndex(names)
+        matches = [index.match(query, ratio, substring=substring) for query in unique_queries]
+    else:
+        chunks = [unique_queries[k: k + chunksize]
+                  for k in range(0, len(unique_queries), chunksize)]
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(names,)) as executor:
+            results = executor.map(_match_chunk, chunks,
+                                   [ratio] * len(chunks), [substring] * len(chunks))
+            matches = [m for result in results for m in result]
+    matches = dict(zip(unique_queries, matches))
+
+    pairs = [(q, j) for q, query in enumerate(queries) for j in sorted(matches[query])]
+    return np.array(pairs, dtype=np.int64).reshape(-1, 2)
+
+
+def find_conflicts(fullnames, conflicts, ratio: int = 85, sep: str = ";",
+                   n_jobs: int = 1):
+    """
+    Compute conflict of interest pairs between people
+
+    Parameters
+    ==========
+    fullnames: list, full name of each person
+    conflicts: list, scientist names that each person has a conflict with,
+        separated by ``sep``
+    ratio: int, Fuzzy matching ratio, 100 mean exact match, 85 allow some errors
+    sep: str, a separator
+    n_jobs: int, number of processes for fuzzy matching, see ``match_names``
+
+    Output
+    ======
+    cois: ndarray, (n_cois, 2) array of unique (i, j) pairs of person indices,
+        both (i, j) and (j, i) are included
+    """
+    owners, queries = [], []
+    for i, conflict in enumerate(conflicts):
+        exclude_list = conflict.split(sep)
+        owners.extend([i] * len(exclude_list))
+        queries.extend(exclude_list)
+    pairs = match_names(fullnames, queries, ratio=ratio, n_jobs=n_jobs)
+    cois = np.column_stack([np.array(owners, dtype=np.int64)[pairs[:, 0]], pairs[:, 1]])
+    return np.unique(np.vstack([cois, cois[:, ::-1]]), axis=0)
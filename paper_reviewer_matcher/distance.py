@@ -0,0 +1,91 @@
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+__all__ = ["pairwise_affinity"]
+
+
+def _block_size(n_columns, itemsize, max_memory):
+    """
+    Number of rows per block so that a block (and its temporary copy)
+    fits in ``max_memory`` megabytes
+    """
+    return max(1, int(max_memory * 2 ** 20 // (2 * n_columns * itemsize)))
+
+
+def pairwise_affinity(X1, X2, distance: str = 'euclidean',
+                      dtype=np.float32, block_size: int = None,
+                      max_memory: float = 512, n_jobs: int = 1,
+                      out: np.ndarray = None):
+    """
+    Calculate dense affinity matrix (negative distance) between X1 and X2
+
+    Rows of X1 are processed in blocks so that the temporary memory
+    stays within ``max_memory`` megabytes. Each block is computed with
+    a single matrix product (BLAS) using the identity
+    ||x - y||^2 = ||x||^2 + ||y||^2 - 2 x.y and blocks are distributed
+    over a pool of ``n_jobs`` threads.
+
+    Parameters
+    ----------
+    X1: ndarray, (n1, n_features) e.g. paper vectors
+    X2: ndarray, (n2, n_features) e.g. reviewer vectors
+    distance: str, either 'euclidean' or 'cosine' distance
+    dtype: numpy dtype used for computation, default np.float32
+    block_size: int, number of rows of X1 per block,
+        default None to derive from ``max_memory``
+    max_memory: float, memory budget per block in megabytes
+    n_jobs: int, number of threads, -1 to use all processors
+    out: ndarray or np.memmap, (n1, n2) output buffer to write to,
+        default None to allocate a new array of ``dtype``
+
+    Returns
+    -------
+    out: ndarray, (n1, n2) affinity matrix i.e. negative distance
+    """
+    if distance not in ('euclidean', 'cosine'):
+        raise ValueError("Distance function can only be selected from `euclidean` or `cosine`")
+    X1 = np.asarray(X1, dtype=dtype)
+    X2 = np.asarray(X2, dtype=dtype)
+    n1, n2 = X1.shape[0], X2.shape[0]
+
+    if distance == 'cosine':
+        norm1 = np.linalg.norm(X1, axis=1, keepdims=True)
+        norm2 = np.linalg.norm(X2, axis=1, keepdims=True)
+        X1 = X1 / np.where(norm1 == 0, 1, norm1)
+        X2 = X2 / np.where(norm2 == 0, 1, norm2)
+    else:
+        sq1 = np.einsum('ij,ij->i', X1, X1)
+        sq2 = np.einsum('ij,ij->i', X2, X2)
+
+    if out is None:
+        out = np.empty((n1, n2), dtype=dtype)
+    if block_size is None:
+        block_size = _block_size(n2, np.dtype(dtype).itemsize, max_memory)
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = os.cpu_count() or 1
+
+    X2_T = X2.T
+    def compute_block(start):
+        stop = min(start + block_size, n1)
+        S = X1[start: stop] @ X2_T
+        if distance == 'euclidean':
+            S *= -2
+            S += sq1[start: stop, None]
+            S += sq2[None, :]
+            np.maximum(S, 0, out=S)
+            np.sqrt(S, out=S)
+            np.negative(S, out=S)
+        else:
+            S -= 1
+            np.clip(S, -2, 0, out=S)
+        out[start: stop] = S
+
+    starts = range(0, n1, block_size)
+    if n_jobs == 1:
+        for start in starts:
+            compute_block(start)
+    else:
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            list(executor.map(compute_block, starts))
+    return out
@@ -0,0 +1,117 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import maximum_flow
+from .affinity import _edges, trim_affinity
+from .flow import _bounds_error, _circulation
+
+__all__ = ["check_feasibility", "tune_trim"]
+
+
+def check_feasibility(A, min_reviewers_per_paper=0, max_reviewers_per_paper=10,
+                      min_papers_per_reviewer=0, max_papers_per_reviewer=10,
+                      verbose=True):
+    """
+    Check if the assignment problem on the candidate graph of A (nonzero
+    entries) has a feasible solution before running the solver
+
+    Degrees of papers and reviewers in the candidate graph are first
+    compared to the minimum bounds. Then the problem is checked exactly as
+    a circulation with lower bounds (source -> paper -> reviewer -> sink
+    -> source): lower bounds are moved to the supplies of the nodes and the
+    problem is feasible if and only if the maximum flow from a super source
+    to a super sink saturates all supplies.
+
+    Parameters
+    ----------
+    A: ndarray or sparse matrix, (n_papers, n_reviewers) affinity matrix,
+        zero entries are not considered as possible assignments
+    verbose: bool, print the reason if the problem is infeasible
+
+    Returns
+    -------
+    feasible: bool, True if the problem has a feasible solution
+    """
+    n_papers, n_reviewers = A.shape
+    i, j, _ = _edges(A)
+
+    def infeasible(message):
+        if verbose:
+            print(message)
+        return False
+
+    bounds = (min_reviewers_per_paper, max_reviewers_per_paper,
+              min_papers_per_reviewer, max_papers_per_reviewer)
+    error = _bounds_error(n_papers, n_reviewers, *bounds)
+    if error is not None:
+        return infeasible(error)
+    paper_degrees = np.bincount(i, minlength=n_papers)
+    reviewer_degrees = np.bincount(j, minlength=n_reviewers)
+    if (paper_degrees < min_reviewers_per_paper).any():
+        return infeasible("{} papers have fewer than {} candidate reviewers".format(
+            (paper_degrees < min_reviewers_per_paper).sum(), min_reviewers_per_paper))
+    if (reviewer_degrees < min_papers_per_reviewer).any():
+        return infeasible("{} reviewers have fewer than {} candidate papers".format(
+            (reviewer_degrees < min_papers_per_reviewer).sum(), min_papers_per_reviewer))
+
+    # circulation with lower bounds moved to supplies, nodes are papers,
+    # reviewers, source, sink, super source and super sink
+    tails, heads, capacities, supplies = _circulation(n_papers, n_reviewers, i, j, *bounds)
+    super_source, super_sink = len(supplies), len(supplies) + 1
+
+    nodes = np.arange(len(supplies))
+    positive, negative = supplies > 0, supplies < 0
+    tails = np.concatenate([tails, np.full(positive.sum(), super_source), nodes[negative]])
+    heads = np.concatenate([heads, nodes[positive], np.full(negative.sum(), super_sink)])
+    capacities = np.concatenate([capacities, supplies[positive], -supplies[negative]])
+    keep = capacities > 0
+    graph = sp.csr_matrix((capacities[keep].astype(np.int32), (tails[keep], heads[keep])),
+                          shape=(super_sink + 1, super_sink + 1))
+    flow = maximum_flow(graph, super_source, super_sink).flow_value
+    if flow < supplies[positive].sum():
+        return infeasible("No assignment satisfies the bounds on the candidate graph "
+                          "(maximum flow {} < {})".format(flow, supplies[positive].sum()))
+    return True
+
+
+def tune_trim(A, min_reviewers_per_paper=0, max_reviewers_per_paper=10,
+              min_papers_per_reviewer=0, max_papers_per_reviewer=10,
+              min_column_coverage=0):
+    """
+    Find the most aggressive trimming of A that keeps the problem feasible
+
+    The number of candidates kept per paper is found by binary search with
+    ``check_feasibility`` on ``trim_affinity(A, keep=...)``, the candidate
+    graphs are nested so feasibility only increases with the number kept.
+
+    Parameters
+    ----------
+    A: ndarray, (n_papers, n_reviewers) affinity matrix
+    min_column_coverage: int, see ``trim_affinity``
+
+    Returns
+    -------
+    n_trim: int, largest number of lowest affinities to drop per paper
+        (``drop`` of ``trim_affinity``), None if A itself is infeasible
+    """
+    n_reviewers = A.shape[1]
+    bounds = dict(min_reviewers_per_paper=min_reviewers_per_paper,
+                  max_reviewers_per_paper=max_reviewers_per_paper,
+                  min_papers_per_reviewer=min_papers_per_reviewer,
+                  max_papers_per_reviewer=max_papers_per_reviewer)
+
+    def is_feasible(keep):
+        A_trim = trim_affinity(A, keep=keep, sparse=True,
+                               min_column_coverage=min_column_coverage)
+        return check_feasibility(A_trim, verbose=False, **bounds)
+
+    if not is_feasible(n_reviewers):
+        print("The problem is infeasible even without trimming")
+        return None
+    low, high = max(min_reviewers_per_paper, 1), n_reviewers
+    while low < high:
+        keep = (low + high) // 2
+        if is_feasible(keep):
+            high = keep
+        else:
+            low = keep + 1
+    return n_reviewers - high
@@ -0,0 +1,168 @@
+import numpy as np
+from .assignment import Assignment
+from .affinity import _edges, create_lp_matrix, create_assignment
+
+try:
+    from ortools.graph.python.min_cost_flow import SimpleMinCostFlow
+except ImportError:
+    try:
+        from ortools.graph.pywrapgraph import SimpleMinCostFlow
+    except ImportError:
+        SimpleMinCostFlow = None
+
+__all__ = ["flow_assignment"]
+
+
+def _min_cost_flow(tails, heads, capacities, costs, supplies):
+    """
+    Solve min-cost flow problem with OR-Tools ``SimpleMinCostFlow``,
+    return flow on each arc or None if the problem is infeasible
+    """
+    smcf = SimpleMinCostFlow()
+    if hasattr(smcf, 'add_arcs_with_capacity_and_unit_cost'):
+        arcs = smcf.add_arcs_with_capacity_and_unit_cost(tails, heads, capacities, costs)
+        smcf.set_nodes_supplies(np.arange(len(supplies)), supplies)
+        if smcf.solve() != smcf.OPTIMAL:
+            return None
+        return smcf.flows(arcs)
+    else:
+        # OR-Tools before 9.4 only provides the arc-by-arc API
+        arcs = [smcf.AddArcWithCapacityAndUnitCost(int(t), int(h), int(c), int(w))
+                for t, h, c, w in zip(tails, heads, capacities, costs)]
+        for node, supply in enumerate(supplies):
+            smcf.SetNodeSupply(node, int(supply))
+        if smcf.Solve() != smcf.OPTIMAL:
+            return None
+        return np.array([smcf.Flow(arc) for arc in arcs])
+
+
+def _bounds_error(n_papers, n_reviewers, min_reviewers_per_paper, max_reviewers_per_paper,
+                  min_papers_per_reviewer, max_papers_per_reviewer):
+    """
+    Return why the bounds cannot be satisfied by any assignment, None if they can
+    """
+    if min_reviewers_per_paper > max_reviewers_per_paper or \
+            min_papers_per_reviewer > max_papers_per_reviewer:
+        return "Minimum bounds are larger than maximum bounds"
+    if n_papers * min_reviewers_per_paper > n_reviewers * max_papers_per_reviewer or \
+            n_reviewers * min_papers_per_reviewer > n_papers * max_reviewers_per_paper:
+        return "Total number of assignments cannot satisfy both paper and reviewer bounds"
+    return None
+
+
+def _circulation(n_papers, n_reviewers, i, j, min_reviewers_per_paper, max_reviewers_per_paper,
+                 min_papers_per_reviewer, max_papers_per_reviewer):
+    """
+    Circulation graph of the assignment problem with edges (i, j): source ->
+    paper (between min and max reviewers per paper), paper -> reviewer (at
+    most 1), reviewer -> sink (between min and max papers per reviewer) and
+    sink -> source. Lower bounds of an arc (u, v) are removed with the
+    standard demand transformation: the lower bound is subtracted from the
+    capacity and moved to the supply of v and the demand of u.
+
+    Nodes are papers, reviewers, source and sink. Arcs are ordered as source
+    arcs, edges (i, j), sink arcs and the sink -> source arc.
+
+    Returns
+    -------
+    tails, heads: ndarray, nodes of each arc
+    capacities: ndarray, capacity of each arc after removing lower bounds
+    supplies: ndarray, supply of each node
+    """
+    source = n_papers + n_reviewers
+    sink = source + 1
+    papers = np.arange(n_papers)
+    reviewers = np.arange(n_papers, n_papers + n_reviewers)
+    total = max(n_papers * max_reviewers_per_paper, n_reviewers * max_papers_per_reviewer)
+
+    tails = np.concatenate([np.full(n_papers, source), i, reviewers, [sink]]).astype(np.int64)
+    heads = np.concatenate([papers, j + n_papers, np.full(n_reviewers, sink), [source]]).astype(np.int64)
+    lower = np.concatenate([
+        np.full(n_papers, min_reviewers_per_paper),
+        np.zeros(len(i)),
+        np.full(n_reviewers, min_papers_per_reviewer),
+        [0]
+    ]).astype(np.int64)
+    upper = np.concatenate([
+        np.full(n_papers, max_reviewers_per_paper),
+        np.ones(len(i)),
+        np.full(n_reviewers, max_papers_per_reviewer),
+        [total]
+    ]).astype(np.int64)
+
+    supplies = np.zeros(n_papers + n_reviewers + 2, dtype=np.int64)
+    np.add.at(supplies, heads, lower)
+    np.subtract.at(supplies, tails, lower)
+    return tails, heads, upper - lower, supplies
+
+
+def flow_assignment(A, min_reviewers_per_paper=0, max_reviewers_per_paper=10,
+                    min_papers_per_reviewer=0, max_papers_per_reviewer=10,
+                    cost_scale=1e6):
+    """
+    Solve paper-reviewer assignment problem as a min-cost flow problem
+
+    The bipartite graph of papers and reviewers, with an edge for each
+    nonzero entry of A, is connected to a source node (source -> paper
+    with capacity between min and max reviewers per paper) and a sink
+    node (reviewer -> sink with capacity between min and max papers per
+    reviewer). A sink -> source arc turns it into a circulation problem,
+    see ``_circulation``.
+
+    This solves the same problem as ``create_lp_matrix`` and ``linprog``
+    but uses network simplex instead of a generic LP solver.
+
+    Parameters
+    ----------
+    A: ndarray or sparse matrix, affinity matrix between papers and reviewers,
+        zero entries are not considered as possible assignments
+    cost_scale: float, affinity is multiplied by cost_scale and rounded
+        to integer since the flow solver only accepts integer costs
+
+    Returns
+    -------
+    b: Assignment, assigned (paper, reviewer) pairs,
+        same as the output of ``create_assignment``.
+        b is empty with ``b.feasible`` False if the problem is infeasible.
+    """
+    n_papers, n_reviewers = A.shape
+    i, j, v = _edges(A)
+
+    bounds = (min_reviewers_per_paper, max_reviewers_per_paper,
+              min_papers_per_reviewer, max_papers_per_reviewer)
+
+    # negative capacities make the flow solver loop forever, so the bounds
+    # are checked first as in ``check_feasibility``
+    error = _bounds_error(n_papers, n_reviewers, *bounds)
+    if error is not None:
+        print(error + ", try relaxing the constraints")
+        return Assignment([], [], A.shape, feasible=False)
+
+    if SimpleMinCostFlow is None:
+        # fall back to solve the same problem with scipy (HiGHS)
+        from scipy.optimize import linprog as scipy_linprog
+        v, K, d, lp_bounds = create_lp_matrix(
+            A, min_reviewers_per_paper=min_reviewers_per_paper,
+            max_reviewers_per_paper=max_reviewers_per_paper,
+            min_papers_per_reviewer=min_papers_per_reviewer,
+            max_papers_per_reviewer=max_papers_per_reviewer
+        )
+        result = scipy_linprog(-v, A_ub=K, b_ub=d, bounds=lp_bounds, method='highs')
+        if result.x is None:
+            return Assignment([], [], A.shape, feasible=False)
+        return create_assignment(result.x, A)
+
+    tails, heads, capacities, supplies = _circulation(n_papers, n_reviewers, i, j, *bounds)
+    costs = np.concatenate([
+        np.zeros(n_papers),
+        - np.round(v * cost_scale),
+        np.zeros(n_reviewers + 1)
+    ]).astype(np.int64)
+
+    flows = _min_cost_flow(tails.astype(np.int32), heads.astype(np.int32),
+                           capacities, costs, supplies)
+    if flows is None:
+        print("The flow problem is infeasible, try relaxing the constraints")
+        return Assignment([], [], A.shape, feasible=False)
+    t = np.asarray(flows)[n_papers: n_papers + len(v)] > 0
+    return Assignment(i[t], j[t], A.shape, affinity=v[t])
@@ -0,0 +1,484 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from sklearn.utils import check_random_state
+from .neighbors import _squared_distances
+
+__all__ = ["TIMEZONE_WEIGHTS",
+           "timezone_distance_matrix",
+           "language_distance_matrix",
+           "geo_distance_matrix",
+           "availability_masks",
+           "availability_classes",
+           "cannot_link_pairs",
+           "availability_partitions",
+           "size_constrained_kmeans",
+           "constrained_kmeans",
+           "one_hot",
+           "unit_sphere_coordinates",
+           "feature_embedding",
+           "landmark_mds"]
+
+# distance between two people for each timezone rule, see ``timezone_distance_matrix``
+TIMEZONE_WEIGHTS = {
+    'same': 0.0,            # same timezone and same second timezone
+    'same_timezone': 0.3,   # same timezone, different second timezone
+    'overlap': 0.3,         # any other match between timezone and second timezone
+    'different': 1.0        # no match
+}
+
+
+def _factorize(*columns):
+    """
+    Integer codes of values in a list of columns on shared categories,
+    missing values (None or NaN) get code -1
+    """
+    values = pd.Series(np.concatenate([np.asarray(c, dtype=object) for c in columns]))
+    codes, _ = pd.factorize(values)
+    return np.split(codes, np.cumsum([len(c) for c in columns])[:-1])
+
+
+def _equal(codes_1, codes_2):
+    """
+    Broadcast equality of codes, missing values are never equal
+    """
+    return (codes_1[:, None] == codes_2[None, :]) & (codes_1[:, None] >= 0)
+
+
+def timezone_distance_matrix(timezones, second_timezones, weights=None, dtype=np.float32):
+    """
+    Calculate timezone distance matrix between people from their
+    preferred timezone and second timezone
+
+    Values are encoded once as categorical codes and all pairs are
+    compared with broadcast equality. The distance of each pair is
+    the weight of the first rule that applies in ``TIMEZONE_WEIGHTS``.
+
+    Parameters
+    ----------
+    timezones: list, preferred timezone of each person
+    second_timezones: list, second timezone of each person
+    weights: dict, weight of rules to override in ``TIMEZONE_WEIGHTS``
+    dtype: numpy dtype of the output
+
+    Returns
+    -------
+    D_tz: ndarray, (n_people, n_people) timezone distance matrix
+    """
+    weights = dict(TIMEZONE_WEIGHTS, **(weights or {}))
+    tz, second_tz = _factorize(timezones, second_timezones)
+    same_tz = _equal(tz, tz)
+    same_second_tz = _equal(second_tz, second_tz)
+    overlap = same_tz | same_second_tz | _equal(tz, second_tz) | _equal(second_tz, tz)
+
+    D_tz = np.full((len(tz), len(tz)), weights['different'], dtype=dtype)
+    D_tz[overlap] = weights['overlap']
+    D_tz[same_tz & ~same_second_tz] = weights['same_timezone']
+    D_tz[same_tz & same_second_tz] = weights['same']
+    return D_tz
+
+
+def language_distance_matrix(languages, weight=-0.5, dtype=np.float32):
+    """
+    Calculate language distance matrix between people, the distance is
+    ``weight`` if two different people have the same language preference
+    and 0 otherwise. None is treated as an empty preference and NaN
+    is never equal to any language.
+
+    Parameters
+    ----------
+    languages: list, language preference of each person
+    weight: float, distance between people with the same language
+    dtype: numpy dtype of the output
+
+    Returns
+    -------
+    D_language: ndarray, (n_people, n_people) language distance matrix
+    """
+    languages = ['' if l is None else l for l in languages]
+    codes, = _factorize(languages)
+    same_language = _equal(codes, codes)
+    np.fill_diagonal(same_language, False)
+    return np.where(same_language, weight, 0).astype(dtype)
+
+
+def geo_distance_matrix(lat1, lng1, lat2=None, lng2=None, R=6373.0,
+                        block_size=1024, dtype=np.float32):
+    """
+    Great-circle (haversine) distance in kilometers between two lists of
+    locations given as latitudes and longitudes in degrees, computed with
+    numpy broadcasting in blocks of ``block_size`` rows
+
+    Parameters
+    ----------
+    lat1, lng1: arrays, latitudes and longitudes of the first locations
+    lat2, lng2: arrays, latitudes and longitudes of the second locations,
+        default None to use the first locations
+    R: float, radius of the earth in kilometers
+    dtype: numpy dtype of the output
+
+    Returns
+    -------
+    D: ndarray, (n1, n2) distance matrix, NaN where a location is missing
+    """
+    lat1 = np.radians(np.asarray(lat1, dtype=np.float64))
+    lng1 = np.radians(np.asarray(lng1, dtype=np.float64))
+    if lat2 is None:
+        lat2, lng2 = lat1, lng1
+    else:
+        lat2 = np.radians(np.asarray(lat2, dtype=np.float64))
+        lng2 = np.radians(np.asarray(lng2, dtype=np.float64))
+    cos_lat1, cos_lat2 = np.cos(lat1), np.cos(lat2)
+
+    D = np.empty((len(lat1), len(lat2)), dtype=dtype)
+    for start in range(0, len(lat1), block_size):
+        stop = min(start + block_size, len(lat1))
+        d_lat = lat1[start: stop, None] - lat2[None, :]
+        d_lng = lng1[start: stop, None] - lng2[None, :]
+        a = np.sin(d_lat / 2) ** 2 + cos_lat1[start: stop, None] * cos_lat2[None, :] * np.sin(d_lng / 2) ** 2
+        D[start: stop] = R * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return D
+
+
+def availability_masks(*slot_columns):
+    """
+    Encode the available slots (e.g. timezone, second and third timezone)
+    of each person as a bitmask, so two people overlap if ``m1 & m2 != 0``
+
+    Empty strings and missing values are not slots. Masks are stored in
+    as many uint64 words as needed for the number of distinct slots.
+
+    Parameters
+    ----------
+    slot_columns: lists, one list per slot column with a value per person
+
+    Returns
+    -------
+    masks: ndarray, (n_people, n_words) uint64 availability bitmasks
+    """
+    columns = [[np.nan if v == '' else v for v in c] for c in slot_columns]
+    codes = np.column_stack(_factorize(*columns))
+    n_slots = codes.max() + 1 if codes.size else 0
+    masks = np.zeros((len(codes), max(1, -(-n_slots // 64))), dtype=np.uint64)
+    people, column = np.nonzero(codes >= 0)
+    slots = codes[people, column]
+    np.bitwise_or.at(masks, (people, slots // 64), np.left_shift(np.uint64(1), (slots % 64).astype(np.uint64)))
+    return masks
+
+
+def availability_classes(masks):
+    """
+    Group people with the same set of available slots into classes
+
+    Returns
+    -------
+    labels: ndarray, class of each person
+    class_masks: ndarray, (n_classes, n_words) bitmask of each class
+    conflicts: ndarray, (n_classes, n_classes) boolean, True if two classes
+        have no slot in common. A class without any slot conflicts
+        with every class including itself.
+    """
+    class_masks, labels = np.unique(masks, axis=0, return_inverse=True)
+    overlap = np.zeros((len(class_masks), len(class_masks)), dtype=bool)
+    for w in range(class_masks.shape[1]):
+        overlap |= (class_masks[:, None, w] & class_masks[None, :, w]) != 0
+    return labels.ravel(), class_masks, ~overlap
+
+
+def cannot_link_pairs(masks):
+    """
+    Cannot-link constraints between people without any common slot, computed
+    between availability classes and expanded to the people of each class
+
+    Returns
+    -------
+    cannot_link: ndarray, (n_pairs, 2) index pairs (i, j), both (i, j) and (j, i)
+        are included, sorted by i then j
+    """
+    labels, _, conflicts = availability_classes(masks)
+    order = np.argsort(labels, kind='stable')
+    indptr = np.searchsorted(labels[order], np.arange(len(conflicts) + 1))
+    members = np.split(order, indptr[1:-1])
+    pairs = [np.stack(np.meshgrid(members[a], members[b], indexing='ij'), axis=-1).reshape(-1, 2)
+             for a, b in zip(*np.nonzero(conflicts))]
+    if not pairs:
+        return np.zeros((0, 2), dtype=np.int64)
+    pairs = np.vstack(pairs)
+    return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+
+def _slot_bits(masks):
+    """
+    Boolean (n_people, n_slots) matrix of the slots set in bitmasks
+    """
+    masks = np.ascontiguousarray(masks, dtype=np.uint64)
+    return np.unpackbits(masks.view(np.uint8), axis=1, bitorder='little').astype(bool)
+
+
+def availability_partitions(masks):
+    """
+    Partition people so that everyone in a partition shares a common slot,
+    each person is put in the partition of their most popular slot
+
+    Returns
+    -------
+    partitions: ndarray, slot index of the partition of each person,
+        -1 for people without any slot
+    """
+    bits = _slot_bits(masks)
+    popularity = bits.sum(axis=0)
+    score = np.where(bits, popularity[None, :], -1)
+    return np.where(bits.any(axis=1), np.argmax(score, axis=1), -1)
+
+
+def _capacity_assign(D, capacity):
+    """
+    Assign rows of distance matrix D to columns (clusters) with at most
+    ``capacity`` rows each: at each round, every unassigned row proposes its
+    nearest cluster with remaining capacity and each cluster accepts its
+    closest proposals. Rows are left unassigned (-1) when capacity runs out.
+    """
+    n, k = D.shape
+    labels = np.full(n, -1, dtype=np.int64)
+    remaining = np.array(capacity, dtype=np.int64)
+    while remaining.sum() > 0 and (labels < 0).any():
+        free = np.flatnonzero(labels < 0)
+        D_free = np.where(remaining[None, :] > 0, D[free], np.inf)
+        choice = np.argmin(D_free, axis=1)
+        d = D_free[np.arange(len(free)), choice]
+        order = np.lexsort((d, choice))
+        free, choice = free[order], choice[order]
+        rank = np.arange(len(choice)) - np.searchsorted(choice, choice)
+        accept = rank < remaining[choice]
+        labels[free[accept]] = choice[accept]
+        remaining -= np.bincount(choice[accept], minlength=k)
+    return labels
+
+
+def size_constrained_kmeans(X, n_clusters, n_iter=20, random_state=None):
+    """
+    K-means where cluster sizes differ by at most one, i.e. each cluster has
+    ``n // n_clusters`` or ``n // n_clusters + 1`` points
+
+    Parameters
+    ----------
+    X: ndarray, (n_samples, n_features) data e.g. embedding of people
+    n_clusters: int, number of clusters
+    n_iter: int, maximum number of iterations
+    random_state: int or None, seed of the initial centers
+
+    Returns
+    -------
+    labels: ndarray, cluster of each sample
+    centers: ndarray, (n_clusters, n_features) cluster centers
+    """
+    X = np.asarray(X, dtype=np.float64)
+    n = len(X)
+    n_clusters = max(1, min(n_clusters, n))
+    random_state = check_random_state(random_state)
+    centers = X[random_state.choice(n, n_clusters, replace=False)]
+    size = n // n_clusters
+
+    labels = None
+    for _ in range(n_iter):
+        D = _squared_distances(X, centers)
+        new_labels = _capacity_assign(D, np.full(n_clusters, size))
+        # remaining points, at most one more per cluster
+        free = np.flatnonzero(new_labels < 0)
+        if len(free) > 0:
+            new_labels[free] = _capacity_assign(D[free], np.ones(n_clusters))
+        if labels is not None and np.array_equal(labels, new_labels):
+            break
+        labels = new_labels
+        centers = np.zeros_like(centers)
+        np.add.at(centers, labels, X)
+        centers /= np.bincount(labels, minlength=n_clusters)[:, None]
+    return labels, centers
+
+
+def _merge_small_pods(X, pods, masks, min_pod_size, max_pod_size):
+    """
+    Move each person of a pod smaller than ``min_pod_size`` to the closest
+    pod (by center) of at least ``min_pod_size`` and fewer than
+    ``max_pod_size`` people who all share a slot with them, so that everyone
+    in a pod still shares a slot. Pods are renumbered from 0 and pods that
+    are still too small (no compatible pod has room) are reported.
+    """
+    n_pods = pods.max() + 1
+    sizes = np.bincount(pods, minlength=n_pods)
+    centers = np.zeros((n_pods, X.shape[1]))
+    np.add.at(centers, pods, X)
+    centers /= sizes[:, None]
+    # slots shared by everyone in each pod
+    common = np.full((n_pods, masks.shape[1]), np.iinfo(np.uint64).max, dtype=np.uint64)
+    np.bitwise_and.at(common, pods, masks)
+
+    for q in np.flatnonzero(sizes < min_pod_size):
+        for i in np.flatnonzero(pods == q):
+            compatible = ((common & masks[i]) != 0).any(axis=1) & \
+                (sizes >= min_pod_size) & (sizes < max_pod_size)
+            if not compatible.any():
+                continue
+            D = _squared_distances(X[i: i + 1], centers)[0]
+            t = np.argmin(np.where(compatible, D, np.inf))
+            pods[i] = t
+            centers[t] += (X[i] - centers[t]) / (sizes[t] + 1)
+            sizes[t] += 1
+            sizes[q] -= 1
+            common[t] &= masks[i]
+    pods = np.unique(pods, return_inverse=True)[1].ravel()
+
+    n_small = (np.bincount(pods) < min_pod_size).sum()
+    if n_small > 0:
+        print("{} pods have fewer than {} people and no compatible pod with room "
+              "to merge into".format(n_small, min_pod_size))
+    return pods
+
+
+def constrained_kmeans(X, masks=None, pod_size=10, min_pod_size=None, max_pod_size=None,
+                       n_iter=20, n_jobs=1, random_state=None):
+    """
+    Group people into pods of about ``pod_size`` people with common availability
+
+    People are first partitioned with ``availability_partitions`` so that
+    everyone in a partition shares a slot, which satisfies all cannot-link
+    constraints of ``cannot_link_pairs`` by construction. Each partition is
+    then clustered with ``size_constrained_kmeans`` into pods whose sizes
+    differ by at most one, partitions are clustered in parallel threads.
+    People without any slot are grouped in their own partition.
+
+    Small partitions give pods smaller than ``min_pod_size``, their people
+    are moved to the closest pod with fewer than ``max_pod_size`` people who
+    all share a slot with them. Pods that are still too small (e.g. people
+    without any slot) are reported.
+
+    Parameters
+    ----------
+    X: ndarray, (n_people, n_features) embedding of people
+    masks: ndarray, availability bitmasks from ``availability_masks``,
+        default None to cluster everyone together
+    pod_size: int, target number of people per pod
+    min_pod_size: int, minimum number of people per pod,
+        default to half of ``pod_size``
+    max_pod_size: int, pods are not filled beyond this size when merging
+        small pods, default to ``pod_size + 1``
+    n_jobs: int, number of threads, -1 to use all processors
+
+    Returns
+    -------
+    pods: ndarray, pod number of each person, from 0 to n_pods - 1
+    """
+    n = len(X)
+    partitions = availability_partitions(masks) if masks is not None else np.zeros(n, dtype=np.int64)
+    if min_pod_size is None:
+        min_pod_size = max(1, pod_size // 2)
+    if max_pod_size is None:
+        max_pod_size = pod_size + 1
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = os.cpu_count() or 1
+    random_state = check_random_state(random_state)
+
+    members = [np.flatnonzero(partitions == p) for p in np.unique(partitions)]
+    seeds = random_state.randint(np.iinfo(np.int32).max, size=len(members))
+
+    def cluster(k):
+        n_clusters = max(1, int(round(len(members[k]) / pod_size)))
+        labels, _ = size_constrained_kmeans(X[members[k]], n_clusters,
+                                            n_iter=n_iter, random_state=seeds[k])
+        return labels
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        results = list(executor.map(cluster, range(len(members))))
+
+    pods = np.empty(n, dtype=np.int64)
+    offset = 0
+    for idx, labels in zip(members, results):
+        pods[idx] = labels + offset
+        offset += labels.max() + 1
+    if masks is None:
+        masks = np.ones((n, 1), dtype=np.uint64)
+    return _merge_small_pods(np.asarray(X, dtype=np.float64), pods,
+                             np.asarray(masks, dtype=np.uint64), min_pod_size, max_pod_size)
+
+
+def one_hot(values, dtype=np.float32):
+    """
+    One-hot encoding of categorical values e.g. timezones, two people are at
+    distance sqrt(2) if their values differ and 0 if they are the same.
+    Missing values (None or NaN) are encoded as zeros.
+    """
+    codes, = _factorize(values)
+    X = np.zeros((len(codes), codes.max() + 1 if len(codes) else 0), dtype=dtype)
+    X[np.flatnonzero(codes >= 0), codes[codes >= 0]] = 1
+    return X
+
+
+def unit_sphere_coordinates(lat, lng, dtype=np.float32):
+    """
+    3D coordinates on the unit sphere of latitudes and longitudes in degrees,
+    the euclidean (chord) distance 2 sin(c / 2) grows with the great-circle
+    angle c = ``geo_distance_matrix`` / R. Missing locations are placed at
+    the mean location.
+    """
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lng = np.radians(np.asarray(lng, dtype=np.float64))
+    X = np.column_stack([np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)])
+    missing = np.isnan(X).any(axis=1)
+    if missing.any() and not missing.all():
+        X[missing] = X[~missing].mean(axis=0)
+    return np.nan_to_num(X).astype(dtype)
+
+
+def feature_embedding(blocks, weights=None, dtype=np.float32):
+    """
+    Concatenate weighted feature blocks (e.g. topic vectors, one-hot timezone
+    and unit sphere coordinates) so that the euclidean distance in the embedding
+    combines the distances of each block without forming the n x n matrices
+
+    Parameters
+    ----------
+    blocks: list of ndarray, (n_people, n_features_k) features of each block
+    weights: list of float, weight of each block, default 1 for all blocks
+    """
+    if weights is None:
+        weights = [1] * len(blocks)
+    return np.hstack([w * np.asarray(X, dtype=dtype) for X, w in zip(blocks, weights)])
+
+
+def landmark_mds(distance, n_samples, n_landmarks=500, n_components=30, random_state=None):
+    """
+    Landmark MDS (de Silva and Tenenbaum, 2004) for distances that cannot be
+    written as features, only the distances to ``n_landmarks`` random people
+    are computed: classical MDS is applied to the landmarks and every person
+    is placed by triangulation from their distances to the landmarks
+
+    Parameters
+    ----------
+    distance: callable, ``distance(landmarks)`` returns the (n_samples, n_landmarks)
+        distances between everyone and the people with indices ``landmarks``
+    n_samples: int, number of people
+    n_landmarks: int, number of landmarks
+    n_components: int, dimension of the embedding
+
+    Returns
+    -------
+    X: ndarray, (n_samples, n_components) embedding
+    """
+    random_state = check_random_state(random_state)
+    landmarks = np.sort(random_state.choice(n_samples, min(n_landmarks, n_samples), replace=False))
+    D2 = np.asarray(distance(landmarks), dtype=np.float64) ** 2 # squared distances to landmarks
+    D2_landmarks = D2[landmarks]
+
+    # classical MDS of landmarks
+    mean_landmarks = D2_landmarks.mean(axis=0)
+    B = -0.5 * (D2_landmarks - mean_landmarks[None, :] - D2_landmarks.mean(axis=1)[:, None]
+                + D2_landmarks.mean())
+    w, V = np.linalg.eigh(B)
+    order = np.argsort(w)[::-1][:n_components]
+    w, V = w[order], V[:, order]
+    positive = w > 1e-12
+    pinv = V[:, positive] / np.sqrt(w[positive])
+
+    # triangulation of all people
+    return -0.5 * (D2 - mean_landmarks[None, :]) @ pinv
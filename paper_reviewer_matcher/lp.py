@@ -1,57 +1,74 @@
+import time
 import numpy as np
 from tqdm.auto import tqdm
-from scipy.sparse import coo_matrix
+from scipy.sparse import csr_matrix, coo_matrix
 from ortools.linear_solver import pywraplp
 
 __all__ = ["linprog"]
 
-def linprog(f, A, b):
+def linprog(f, A, b, bounds=None):
     """
     Solve the following linear programming problem
             maximize_x (f.T).dot(x)
             subject to A.dot(x) <= b
-    where   A is a sparse matrix (coo_matrix)
+                       lower <= x <= upper
+    where   A is a sparse matrix
             f is column vector of cost function associated with variable
             b is column vector
+            bounds is a tuple of (lower, upper) bound of variables,
+                default None for unbounded variables
+
+    The model is built by walking the rows of A in CSR format once,
+    so the setup time is linear in the number of nonzeros of A.
+    Setup and solve time (in seconds) are returned along with the solution.
     """
 
     # flatten the variable
-    f = f.ravel()
-    b = b.ravel()
+    f = np.ravel(f)
+    b = np.ravel(b)
+    A = csr_matrix(A)
+    A.sum_duplicates()
 
+    t_start = time.time()
     solver = pywraplp.Solver('SolveReviewerAssignment',
                              pywraplp.Solver.GLOP_LINEAR_PROGRAMMING)
 
     infinity = solver.Infinity()
+    lower, upper = (-infinity, infinity) if bounds is None else bounds
     n, m = A.shape
-    x = [[]] * m
-    c = [0] * n
-
-    print("Setting up variables...")
-    for j in tqdm(range(m)):
-        x[j] = solver.NumVar(-infinity, infinity, 'x_%u' % j)
 
-    # state objective function
-    print("Setting up objective function...")
+    print("Setting up variables and objective function...")
     objective = solver.Objective()
-    for j in tqdm(range(m)):
-        objective.SetCoefficient(x[j], f[j])
+    x = [solver.NumVar(lower, upper, 'x_%u' % j) for j in range(m)]
+    for x_j, f_j in zip(x, f.tolist()):
+        objective.SetCoefficient(x_j, f_j)
     objective.SetMaximization()
 
-    # state the constraints
+    # state the constraints, one CSR row at a time
     print("Setting up constraints...")
+    indptr, indices, data = A.indptr, A.indices.tolist(), A.data.tolist()
     for i in tqdm(range(n)):
-        c[i] = solver.Constraint(-infinity, int(b[i]))
-        for j in A.col[A.row == i]:
-            c[i].SetCoefficient(x[j], A.data[np.logical_and(A.row == i, A.col == j)][0])
+        constraint = solver.Constraint(-infinity, float(b[i]))
+        for k in range(indptr[i], indptr[i + 1]):
+            constraint.SetCoefficient(x[indices[k]], data[k])
+    setup_time = time.time() - t_start
+    print("Setting up the problem took {:.2f} seconds".format(setup_time))
 
+    t_start = time.time()
     result_status = solver.Solve()
+    solve_time = time.time() - t_start
+    print("Solving the problem took {:.2f} seconds".format(solve_time))
     if result_status != 0:
         print("The final solution might not converged")
 
     x_sol = np.array([x_tmp.SolutionValue() for x_tmp in x])
 
-    return {'x': x_sol, 'status': result_status}
+    return {
+        'x': x_sol,
+        'status': result_status,
+        'setup_time': setup_time,
+        'solve_time': solve_time
+    }
 
 
 def test_example():
@@ -64,11 +81,11 @@ def test_example():
         x >= 0 -> -x <= 0
         y >= 0 -> -y <= 0
     """
-    f = np.array([50, 40], dtype=np.float)
+    f = np.array([50, 40], dtype=float)
     A = np.array([[ 2, 3],
                   [ 2, 1],
                   [-1, 0],
-                  [ 0, -1]], dtype=np.float)
+                  [ 0, -1]], dtype=float)
     C = np.array([1500, 1000, 0, 0])
     x_sol = linprog(f, coo_matrix(A), C)
     print('Example Problem:')
@@ -1,14 +1,17 @@
 import numpy as np
 import pandas as pd
-from fuzzywuzzy import fuzz
-from tqdm.auto import tqdm
 from .lp import linprog
-from .affinity import create_lp_matrix, create_assignment
+from .affinity import create_lp_matrix, create_assignment, trim_affinity
+from .flow import flow_assignment
+from .coi import find_conflicts
+from .assignment import Assignment
+from .feasibility import check_feasibility, tune_trim
 
 __all__ = ["perform_mindmatch"]
 
 
-def compute_conflicts(df: pd.DataFrame, ratio: int = 85, sep: str = ";"):
+def compute_conflicts(df: pd.DataFrame, ratio: int = 85, sep: str = ";",
+                      n_jobs: int = 1):
     """
     Compute conflict for a given dataframe
 
@@ -19,54 +22,84 @@ def compute_conflicts(df: pd.DataFrame, ratio: int = 85, sep: str = ";"):
         scientist names with separator (default as semicolon ;)
     ratio: int, Fuzzy matching ratio, 100 mean exact match, 85 allow some errors
     sep: str, a separator
+    n_jobs: int, number of processes for fuzzy matching
+
+    Output
+    ======
+    cois: ndarray, (n_cois, 2) array of unique pairs of index of df,
+        see ``find_conflicts``
     """
-    cois = []
-    for i, r in tqdm(df.iterrows()):
-        exclude_list = r['conflicts'].split(sep)
-        for j, r_ in df.iterrows():
-            if max([fuzz.ratio(r_['fullname'], n) for n in exclude_list]) >= ratio:
-                cois.append([i, j])
-                cois.append([j, i])
-    return cois
+    cois = find_conflicts(list(df['fullname']), list(df['conflicts']), ratio=ratio, sep=sep,
+                          n_jobs=n_jobs)
+    return np.asarray(df.index)[cois].reshape(-1, 2)
 
 
 def perform_mindmatch(
     A: np.array, n_trim: int = None,
-    n_match: int = 6, cois: list = None
+    n_match: int = 6, cois: list = None,
+    solver: str = 'lp', min_column_coverage: int = None
 ):
     """
     Perform mindmatching with a given matrix A,
     trimming of n_trim (reduce problem size),
     matching between n_match people
+
+    n_trim: int or 'auto', number of lowest affinities dropped per person,
+        'auto' to find the largest n_trim that keeps the problem feasible.
+        The trimmed problem is checked with ``check_feasibility`` before
+        solving and an empty assignment with ``b.feasible`` False is returned
+        if it is infeasible.
+    min_column_coverage: int, also keep the ``min_column_coverage`` highest
+        affinities of each person as a column when trimming, see
+        ``trim_affinity``, so that trimming rows does not starve columns.
+        Default None uses ``n_match`` with n_trim='auto' (the binary search
+        would otherwise stop early) and 0 with a given n_trim.
+    solver: str, either 'lp' (linear programming with ortools)
+        or 'flow' (min-cost flow), default 'lp'
+
+    Returns an ``Assignment``, use ``b.reviewer_lists()`` to get
+    the matches of each person
     """
     # setting distance in the diagonal
     A[np.arange(len(A)), np.arange(len(A))] = -1000 
 
     # if conflict of interest (COIs) is available, add to the matrix
-    cois = [(c1, c2) for (c1, c2) in cois
-            if c1 <= len(A) and c2 <= len(A)] # make sure a given cois is in range
-    A[np.array(cois)] = -1000
+    if cois is not None and len(cois) > 0:
+        cois = np.asarray(cois)
+        cois = cois[(cois < len(A)).all(axis=1)] # make sure a given cois is in range
+        A[cois[:, 0], cois[:, 1]] = -1000
+
+    bounds = dict(min_reviewers_per_paper=n_match, max_reviewers_per_paper=n_match,
+                  min_papers_per_reviewer=n_match, max_papers_per_reviewer=n_match)
+    if min_column_coverage is None:
+        min_column_coverage = n_match if n_trim == 'auto' else 0
+    if n_trim == 'auto':
+        n_trim = tune_trim(A, min_column_coverage=min_column_coverage, **bounds)
+        if n_trim is None:
+            return Assignment([], [], A.shape, feasible=False)
+        print('Trimming {} lowest affinities per person'.format(n_trim))
 
     # trimming affinity matrix to reduce the problem size
-    if n_trim != 0:
-        A_trim = []
-        for r in range(len(A)):
-            a = A[r, :]
-            a[np.argsort(a)[0:n_trim]] = 0
-            A_trim.append(a)
-        A_trim = np.vstack(A_trim)
+    if n_trim:
+        A_trim = trim_affinity(A, drop=n_trim, min_column_coverage=min_column_coverage)
     else:
         A_trim = A
 
+    if not check_feasibility(A_trim, **bounds):
+        print('The trimmed problem is infeasible, try reducing <n_trim> or use n_trim="auto"')
+        return Assignment([], [], A.shape, feasible=False)
+
     # solving matching problem
     print('Solving a matching problem...')
-    v, K, d = create_lp_matrix(A_trim, 
-                               min_reviewers_per_paper=n_match, max_reviewers_per_paper=n_match,
-                               min_papers_per_reviewer=n_match, max_papers_per_reviewer=n_match)
-    x_sol = linprog(v, K, d)['x']
-    b = create_assignment(x_sol, A_trim)
+    if solver == 'flow':
+        b = flow_assignment(A_trim, **bounds)
+    else:
+        v, K, d, lp_bounds = create_lp_matrix(A_trim, **bounds)
+        result = linprog(v, K, d, bounds=lp_bounds)
+        b = create_assignment(result['x'], A_trim)
+        b.feasible = result['status'] in (0, 1) # optimal or feasible
 
-    if (b.sum() == 0):
+    if not b.feasible:
         print('Seems like the problem does not converge, try reducing <n_trim> but not too low!')
     else:
         print('Successfully assigned all the match!')
@@ -0,0 +1,221 @@
+import pickle
+import numpy as np
+import scipy.sparse as sp
+from sklearn.neighbors import NearestNeighbors
+from sklearn.utils import check_random_state
+
+__all__ = ["NeighborIndex"]
+
+
+def _normalize_rows(X):
+    norm = np.linalg.norm(X, axis=1, keepdims=True)
+    return X / np.where(norm == 0, 1, norm)
+
+
+def _squared_distances(X1, X2, sq2=None):
+    """
+    Squared euclidean distances between rows of X1 and X2 using BLAS
+    """
+    if sq2 is None:
+        sq2 = np.einsum('ij,ij->i', X2, X2)
+    D = X1 @ X2.T
+    D *= -2
+    D += np.einsum('ij,ij->i', X1, X1)[:, None]
+    D += sq2[None, :]
+    return np.maximum(D, 0, out=D)
+
+
+def _kmeans(X, n_clusters, n_iter=20, random_state=None):
+    """
+    Lloyd's k-means used as a coarse quantizer for the IVF index
+    """
+    random_state = check_random_state(random_state)
+    centroids = X[random_state.choice(len(X), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = np.argmin(_squared_distances(X, centroids), axis=1)
+        counts = np.bincount(labels, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, X)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # reseed empty clusters with random points
+        centroids[empty] = X[random_state.choice(len(X), empty.sum(), replace=False)]
+    labels = np.argmin(_squared_distances(X, centroids), axis=1)
+    return centroids, labels
+
+
+class NeighborIndex:
+    """
+    Nearest-neighbor index over reviewer topic vectors to generate
+    a sparse candidate graph of the ``top_k`` closest reviewers of each paper
+    instead of computing all paper-reviewer distances
+
+    The index can be a KD-tree or a ball tree (exact, from scikit-learn) or
+    a pure NumPy inverted file index 'ivf' (approximate): reviewers are
+    clustered in ``n_lists`` lists with k-means and only the ``n_probe``
+    lists closest to a paper are searched. The fitted index can be saved
+    and loaded so that later re-matches only query it.
+
+    Parameters
+    ----------
+    method: str, one of 'kd_tree', 'ball_tree' or 'ivf'
+    distance: str, either 'euclidean' or 'cosine' distance, cosine is computed
+        as euclidean distance between normalized vectors
+    leaf_size: int, leaf size of the trees
+    n_lists: int, number of lists of 'ivf', default to sqrt(n_reviewers)
+    n_probe: int, number of lists searched per paper for 'ivf'
+    random_state: int or None, seed of the k-means of 'ivf'
+
+    Example
+    -------
+    >> index = NeighborIndex(method='ivf').fit(reviewer_vectors)
+    >> index.save('reviewer_index.pkl')
+    >> index = NeighborIndex.load('reviewer_index.pkl')
+    >> A = index.candidate_graph(paper_vectors, top_k=50) # sparse affinity
+    """
+    def __init__(self, method='kd_tree', distance='euclidean', leaf_size=40,
+                 n_lists=None, n_probe=8, random_state=None):
+        if method not in ('kd_tree', 'ball_tree', 'ivf'):
+            raise ValueError("select method from ['kd_tree', 'ball_tree', 'ivf']")
+        if distance not in ('euclidean', 'cosine'):
+            raise ValueError("Distance function can only be selected from `euclidean` or `cosine`")
+        self.method = method
+        self.distance = distance
+        self.leaf_size = leaf_size
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.random_state = random_state
+        self.n_samples_ = None
+
+    def _prepare(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if self.distance == 'cosine':
+            X = _normalize_rows(X)
+        return X
+
+    def fit(self, X):
+        """
+        Build the index on reviewer vectors ``X``, (n_reviewers, n_features)
+        """
+        X = self._prepare(X)
+        self.n_samples_ = len(X)
+        if self.method == 'ivf':
+            n_lists = self.n_lists or max(1, int(np.sqrt(len(X))))
+            self.centroids_, labels = _kmeans(X, min(n_lists, len(X)),
+                                              random_state=self.random_state)
+            order = np.argsort(labels, kind='stable')
+            self.list_indices_ = order
+            self.list_indptr_ = np.searchsorted(labels[order], np.arange(len(self.centroids_) + 1))
+            self.vectors_ = X[order]
+            self.sq_norms_ = np.einsum('ij,ij->i', self.vectors_, self.vectors_)
+        else:
+            self.tree_ = NearestNeighbors(algorithm=self.method, leaf_size=self.leaf_size).fit(X)
+            self.vectors_ = X
+        return self
+
+    def _vectors(self, indices):
+        """
+        Indexed vectors of the given reviewer indices
+        """
+        if self.method == 'ivf':
+            position = np.empty(self.n_samples_, dtype=np.int64)
+            position[self.list_indices_] = np.arange(self.n_samples_)
+            indices = position[indices]
+        return self.vectors_[indices]
+
+    def query(self, X, top_k=50):
+        """
+        Find the ``top_k`` closest reviewers of each paper vector in ``X``
+
+        Returns
+        -------
+        indices: ndarray, (n_papers, top_k) reviewer indices sorted by distance,
+            padded with -1 if fewer reviewers were found ('ivf')
+        distances: ndarray, (n_papers, top_k) euclidean distances, padded with inf
+        """
+        if self.n_samples_ is None:
+            raise ValueError("NeighborIndex is not fitted yet, call fit first")
+        X = self._prepare(X)
+        top_k = min(top_k, self.n_samples_)
+        if self.method != 'ivf':
+            distances, indices = self.tree_.kneighbors(X, n_neighbors=top_k)
+            return indices, distances
+
+        indices = np.full((len(X), top_k), -1, dtype=np.int64)
+        distances = np.full((len(X), top_k), np.inf)
+        n_probe = min(self.n_probe, len(self.centroids_))
+        D_lists = _squared_distances(X, self.centroids_)
+        probes = np.argpartition(D_lists, n_probe - 1, axis=1)[:, :n_probe]
+        starts, stops = self.list_indptr_[:-1], self.list_indptr_[1:]
+        for i, probe in enumerate(probes):
+            rows = np.concatenate([np.arange(starts[l], stops[l]) for l in probe])
+            D = _squared_distances(X[i: i + 1], self.vectors_[rows], self.sq_norms_[rows])[0]
+            k = min(top_k, len(rows))
+            top = np.argpartition(D, k - 1)[:k] if k < len(rows) else np.arange(len(rows))
+            top = top[np.argsort(D[top], kind='stable')]
+            indices[i, :k] = self.list_indices_[rows[top]]
+            distances[i, :k] = np.sqrt(D[top])
+        return indices, distances
+
+    def candidate_graph(self, X, top_k=50, min_per_column=0, block_size=1024):
+        """
+        Sparse affinity matrix (negative distance) between paper vectors ``X``
+        and their ``top_k`` closest reviewers, which can be given directly
+        to ``create_lp_matrix`` or ``flow_assignment``
+
+        Parameters
+        ----------
+        X: ndarray, (n_papers, n_features) paper vectors
+        top_k: int, number of closest reviewers of each paper
+        min_per_column: int, also keep the ``min_per_column`` closest papers
+            of each reviewer with fewer candidates, found by exact search from
+            the reviewer side as in ``calculate_topk_affinity``, default 0
+        block_size: int, number of reviewers searched at a time for ``min_per_column``
+
+        Returns
+        -------
+        A: scipy.sparse.csr_matrix, (n_papers, n_reviewers) affinity matrix
+        """
+        indices, distances = self.query(X, top_k=top_k)
+        found = indices >= 0
+        rows = np.repeat(np.arange(len(indices)), found.sum(axis=1))
+        cols, distances = indices[found], distances[found]
+
+        columns = np.flatnonzero(np.bincount(cols, minlength=self.n_samples_) < min_per_column)
+        if len(columns) > 0:
+            X = self._prepare(X)
+            k = min(min_per_column, len(X))
+            rows, cols, distances = [rows], [cols], [distances]
+            for start in range(0, len(columns), block_size):
+                block = columns[start: start + block_size]
+                D = _squared_distances(self._vectors(block), X)
+                top = np.argpartition(D, k - 1, axis=1)[:, :k] if k < len(X) \
+                    else np.broadcast_to(np.arange(len(X)), D.shape)
+                rows.append(top.ravel())
+                cols.append(np.repeat(block, k))
+                distances.append(np.sqrt(np.take_along_axis(D, top, axis=1)).ravel())
+            rows, cols, distances = map(np.concatenate, (rows, cols, distances))
+            # remove pairs found both from the paper and the reviewer side
+            _, unique_idx = np.unique(rows * self.n_samples_ + cols, return_index=True)
+            rows, cols, distances = rows[unique_idx], cols[unique_idx], distances[unique_idx]
+
+        if self.distance == 'cosine':
+            values = -distances ** 2 / 2 # cosine similarity - 1
+        else:
+            values = -distances
+        return sp.csr_matrix((values, (rows, cols)), shape=(len(indices), self.n_samples_))
+
+    def save(self, path):
+        """
+        Save the fitted index to ``path``
+        """
+        with open(path, 'wb') as f:
+            pickle.dump(self, f)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a fitted index from ``path``
+        """
+        with open(path, 'rb') as f:
+            return pickle.load(f)
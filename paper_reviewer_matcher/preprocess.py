@@ -1,33 +1,127 @@
+import os
 import re
 import string
+from functools import lru_cache
+from itertools import islice
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from unidecode import unidecode
 from nltk.stem.porter import PorterStemmer
 from nltk.tokenize import WhitespaceTokenizer
+from .cache import get_cache, hash_key
 
-__all__ = ["preprocess"]
+__all__ = ["preprocess", "preprocess_many"]
 
 stemmer = PorterStemmer()
 w_tokenizer = WhitespaceTokenizer()
 punct_re = re.compile('[{}]'.format(re.escape(string.punctuation)))
 
+# lowercase text is mapped in a single pass: punctuation to space
+punct_table = str.maketrans({c: ' ' for c in string.punctuation})
+stem = lru_cache(maxsize=2 ** 16)(stemmer.stem) # stems of frequent tokens are reused
+
 def preprocess(text, stemming=True):
     """
-    Apply Snowball stemmer to string
+    Apply Snowball stemmer to string, see ``preprocess_many``
+    to preprocess many documents at once
 
     Parameters
     ----------
     text : str, input abstract of papers/posters string
     stemming : boolean, apply Porter stemmer if True,
         default True
+
+    If the cache is enabled (see ``set_cache``), preprocessed text
+    is stored on disk and reused for the same text and parameters
     """
     if isinstance(text, (type(None), float)):
-        text_preprocess = ''
+        return ''
+    cache = get_cache()
+    if cache is not None:
+        key = hash_key('preprocess', stemming, text)
+        text_preprocess = cache.get_text(key)
+        if text_preprocess is None:
+            text_preprocess = _preprocess(text, stemming=stemming)
+            cache.set_text(key, text_preprocess)
     else:
-        text = unidecode(text).lower()
-        text = punct_re.sub(' ', text) # remove punctuation
-        if stemming:
-            text_preprocess = [stemmer.stem(token) for token in w_tokenizer.tokenize(text)]
-        else:
-            text_preprocess = w_tokenizer.tokenize(text)
-        text_preprocess = ' '.join(text_preprocess)
+        text_preprocess = _preprocess(text, stemming=stemming)
     return text_preprocess
+
+
+def _preprocess(text, stemming=True):
+    """
+    Normalize, tokenize and stem a given string
+    """
+    tokens = w_tokenizer.tokenize(unidecode(text).lower().translate(punct_table))
+    if stemming:
+        tokens = [stem(token) for token in tokens]
+    return ' '.join(tokens)
+
+
+def _preprocess_chunk(texts, stemming=True):
+    return [_preprocess(text, stemming=stemming) for text in texts]
+
+
+def preprocess_many(texts, stemming=True, n_jobs=1, chunksize=500):
+    """
+    Preprocess an iterable of texts, same output as ``preprocess`` on each text
+
+    Texts are read and processed in chunks of ``chunksize`` and distributed to
+    ``n_jobs`` processes with a bounded number of chunks in flight. Results are
+    yielded in order as a generator so the raw texts do not have to be kept
+    in memory, e.g. ``list(preprocess_many(df['abstracts'], n_jobs=-1))``.
+    Cached results are looked up (and stored) in the main process.
+
+    Parameters
+    ----------
+    texts : iterable, input abstracts of papers/posters string
+    stemming : boolean, apply Porter stemmer if True,
+        default True
+    n_jobs : int, number of processes, -1 to use all processors
+    chunksize : int, number of texts sent to a process at a time
+    """
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = os.cpu_count() or 1
+    cache = get_cache()
+    texts = iter(texts)
+
+    def read_chunk():
+        chunk = [text if not isinstance(text, (type(None), float)) else ''
+                 for text in islice(texts, chunksize)]
+        if cache is None:
+            return chunk, None, None, chunk
+        keys = [hash_key('preprocess', stemming, text) for text in chunk]
+        results = [cache.get_text(key) if text else '' for key, text in zip(keys, chunk)]
+        missing = [text for text, result in zip(chunk, results) if result is None]
+        return chunk, keys, results, missing
+
+    def merge(chunk, keys, results, processed):
+        if results is None:
+            return processed
+        processed = iter(processed)
+        for k, (key, result) in enumerate(zip(keys, results)):
+            if result is None:
+                results[k] = next(processed)
+                cache.set_text(key, results[k])
+        return results
+
+    if n_jobs == 1:
+        while True:
+            chunk, keys, results, missing = read_chunk()
+            if not chunk:
+                return
+            yield from merge(chunk, keys, results, _preprocess_chunk(missing, stemming))
+
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        in_flight = deque()
+        while True:
+            while len(in_flight) < 2 * n_jobs:
+                chunk, keys, results, missing = read_chunk()
+                if not chunk:
+                    break
+                future = executor.submit(_preprocess_chunk, missing, stemming)
+                in_flight.append((chunk, keys, results, future))
+            if not in_flight:
+                return
+            chunk, keys, results, future = in_flight.popleft()
+            yield from merge(chunk, keys, results, future.result())
@@ -0,0 +1,50 @@
+import pandas as pd
+from .preprocess import preprocess_many
+
+__all__ = ["read_mindmatch_csv"]
+
+MINDMATCH_COLUMNS = ['user_id', 'fullname', 'abstracts', 'conflicts']
+
+
+def read_mindmatch_csv(path, chunksize=10000, stemming=True, n_jobs=1, **kwargs):
+    """
+    Read a mind-match registration CSV file in chunks
+
+    Only the required columns are read. Each chunk is validated and its
+    abstracts are streamed to ``preprocess_many`` as it is read, so the raw
+    abstracts of the whole file are never kept in memory at once.
+
+    Parameters
+    ----------
+    path: str, path to a CSV file with columns
+        ('user_id', 'fullname', 'abstracts', 'conflicts')
+    chunksize: int, number of rows to read at a time
+    stemming: bool, apply Porter stemmer to abstracts, see ``preprocess``
+    n_jobs: int, number of processes to preprocess abstracts
+    kwargs: other keyword arguments passed to ``pd.read_csv``
+
+    Returns
+    -------
+    df: pd.DataFrame, a dataframe with columns ('user_id', 'fullname', 'conflicts')
+    abstracts: list, list of preprocessed abstracts in the same order as df
+    """
+    columns = pd.read_csv(path, nrows=0, **kwargs).columns
+    for column in MINDMATCH_COLUMNS:
+        if column not in columns:
+            raise ValueError("CSV file must have ``{}`` in the columns".format(column))
+
+    chunks = []
+    def read_abstracts():
+        reader = pd.read_csv(path, usecols=MINDMATCH_COLUMNS, chunksize=chunksize, **kwargs)
+        for chunk in reader:
+            if chunk['user_id'].isnull().any():
+                raise ValueError("Found missing ``user_id`` around row {}".format(
+                    sum(len(c) for c in chunks) + chunk['user_id'].isnull().values.argmax()))
+            chunk = chunk.fillna('')
+            chunks.append(chunk[['user_id', 'fullname', 'conflicts']])
+            yield from chunk['abstracts']
+
+    abstracts = list(preprocess_many(read_abstracts(), stemming=stemming, n_jobs=n_jobs))
+    df = pd.concat(chunks, ignore_index=True) if chunks else \
+        pd.DataFrame(columns=['user_id', 'fullname', 'conflicts'])
+    return df, abstracts
@@ -0,0 +1,118 @@
+import numpy as np
+import scipy.sparse as sp
+from .affinity import _edges
+from .assignment import Assignment
+from .flow import flow_assignment
+
+__all__ = ["reassign"]
+
+
+def _map_indices(indices, index_map):
+    """
+    Map old indices to new indices with ``index_map`` (-1 if removed)
+    """
+    if index_map is None:
+        return indices
+    return np.asarray(index_map, dtype=np.int64)[indices]
+
+
+def reassign(A, previous, min_reviewers_per_paper=0, max_reviewers_per_paper=10,
+             min_papers_per_reviewer=0, max_papers_per_reviewer=10,
+             paper_map=None, reviewer_map=None, forbidden=None,
+             conflict_value=-1000, stickiness=None, cost_scale=1e6):
+    """
+    Update a previous assignment after small changes (withdrawn reviewers,
+    late papers, new conflicts of interest) while keeping as many of the
+    previous pairs as possible
+
+    The problem is solved with ``flow_assignment`` where each previous pair
+    that is still allowed gets a bonus of ``stickiness`` on its affinity.
+    The default bonus is larger than the largest possible difference in
+    total affinity between two assignments, so the objective is
+    lexicographic: the number of kept previous pairs is maximized first and
+    the total affinity second. Previous pairs that are not candidates of A
+    (zero entries, e.g. trimmed out) are dropped, pass an untrimmed A to
+    keep them.
+
+    Parameters
+    ----------
+    A: ndarray or sparse matrix, (n_papers, n_reviewers) affinity matrix of
+        the new problem, zero entries are not considered as possible assignments
+    previous: Assignment, previous assignment (indices of the previous problem)
+    paper_map: array, new index of each previous paper, -1 if it is removed,
+        default None if paper indices did not change (papers can be added at the end)
+    reviewer_map: array, new index of each previous reviewer, -1 if removed,
+        default None if reviewer indices did not change
+    forbidden: array, (n_pairs, 2) new (paper, reviewer) pairs that cannot be
+        assigned e.g. new conflicts of interest
+    conflict_value: float, entries of A at or below this value (and non-finite
+        entries) are conflicts and cannot be assigned, default -1000 as set
+        by ``perform_mindmatch``, None to keep them as candidates
+    stickiness: float, bonus added to the affinity of previous pairs, default
+        to the lexicographic bound above. A smaller value only makes
+        previous pairs preferred and lets enough better affinities replace them.
+    cost_scale: float, see ``flow_assignment``, lowered if needed so that
+        the integer costs of the default bonus fit in int64 for OR-Tools
+
+    Returns
+    -------
+    b: Assignment, new assignment, empty with ``b.feasible`` False if the
+        problem is infeasible
+    """
+    n_papers, n_reviewers = A.shape
+    i, j, v = _edges(A)
+    keys = i.astype(np.int64) * n_reviewers + j
+    allowed = np.isfinite(v)
+    if conflict_value is not None:
+        allowed &= v > conflict_value
+    keys, v = keys[allowed], v[allowed]
+    if forbidden is not None and len(forbidden) > 0:
+        forbidden = np.asarray(forbidden, dtype=np.int64).reshape(-1, 2)
+        allowed = ~np.isin(keys, forbidden[:, 0] * n_reviewers + forbidden[:, 1])
+        keys, v = keys[allowed], v[allowed]
+
+    # previous pairs in new indices
+    p = _map_indices(previous.papers, paper_map)
+    r = _map_indices(previous.reviewers, reviewer_map)
+    valid = (p >= 0) & (r >= 0) & (p < n_papers) & (r < n_reviewers)
+    previous_keys = p[valid] * n_reviewers + r[valid]
+    n_dropped = len(np.setdiff1d(previous_keys, keys))
+    if n_dropped > 0:
+        print("Dropped {} previous pairs that are not candidates of A".format(n_dropped))
+
+    if stickiness is None:
+        # a bonus larger than the total affinity gain of any change between
+        # assignments of at most n_max pairs, including rounding to integer
+        # costs. Costs times the number of nodes must fit in int64 for
+        # OR-Tools and costs must stay exact integers in float64.
+        n_max = min(n_papers * max_reviewers_per_paper, n_reviewers * max_papers_per_reviewer)
+        span = max(v.max(), 0) - min(v.min(), 0) if len(v) else 0
+        n_nodes = n_papers + n_reviewers + 2
+        max_cost = min(2 ** 52, 2 ** 62 // n_nodes)
+        max_scale = (max_cost / (n_max + 2) - 2) / max(span, 1e-12)
+        if cost_scale > max_scale:
+            cost_scale = max_scale
+            print("cost_scale is lowered to {:.3g} to avoid integer overflow".format(cost_scale))
+        stickiness = (n_max * (span * cost_scale + 1) + 4) / cost_scale
+    is_previous = np.isin(keys, previous_keys)
+    A_sticky = sp.csr_matrix((v + stickiness * is_previous,
+                              (keys // n_reviewers, keys % n_reviewers)),
+                             shape=(n_papers, n_reviewers))
+
+    b = flow_assignment(A_sticky,
+                        min_reviewers_per_paper=min_reviewers_per_paper,
+                        max_reviewers_per_paper=max_reviewers_per_paper,
+                        min_papers_per_reviewer=min_papers_per_reviewer,
+                        max_papers_per_reviewer=max_papers_per_reviewer,
+                        cost_scale=cost_scale)
+    if not b.feasible:
+        return b
+
+    # report affinities of the new problem, not the bonus
+    new_keys = b.papers * n_reviewers + b.reviewers
+    order = np.argsort(keys)
+    affinity = v[order][np.searchsorted(keys[order], new_keys)]
+    n_kept = np.isin(new_keys, previous_keys).sum()
+    print("Kept {} of {} previous pairs, {} new pairs".format(
+        n_kept, len(previous_keys), b.nnz - n_kept))
+    return Assignment(b.papers, b.reviewers, A.shape, affinity=affinity)
@@ -0,0 +1,344 @@
+import pickle
+from itertools import islice
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import LinearOperator, svds
+from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
+from sklearn.decomposition import TruncatedSVD
+from sklearn.utils import check_random_state
+from .vectorizer import LogEntropyVectorizer, BM25Vectorizer, StreamingHashingVectorizer
+
+__all__ = ["TopicModel"]
+
+
+def _iter_batches(papers, batch_size):
+    """
+    Yield lists of ``batch_size`` papers from a list, a re-iterable
+    or a callable that returns a new iterator over the papers
+    """
+    if callable(papers):
+        iterator = papers()
+    else:
+        iterator = iter(papers)
+        if iterator is papers:
+            raise ValueError("papers must be a list, a re-iterable or a callable "
+                             "returning a new iterator since they are read several times")
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class _IncrementalSVD:
+    """
+    Incremental truncated SVD (or PCA if ``center`` is True) of a sparse
+    matrix given in row batches, following the update of IncrementalPCA
+    (Ross et al., 2008). The stacked matrix of previous components and the
+    new batch is decomposed through its Gram matrix, which only needs
+    sparse-dense products, so batches are never densified.
+    """
+    def __init__(self, n_components=30, center=False):
+        self.n_components = n_components
+        self.center = center
+        self.components_ = None
+        self.singular_values_ = None
+        self.mean_ = None
+        self.n_samples_seen_ = 0
+
+    def partial_fit(self, X):
+        X = sp.csr_matrix(X, dtype=np.float64)
+        n_batch, n_features = X.shape
+        if self.components_ is None:
+            self.components_ = np.zeros((0, n_features))
+            self.singular_values_ = np.zeros(0)
+            self.mean_ = np.zeros(n_features)
+        k = len(self.singular_values_)
+        n_old = self.n_samples_seen_
+        n_total = n_old + n_batch
+
+        # stacked matrix M = P + C W, P sparse rows of the batch,
+        # W dense rows (components, means) and C their coefficients
+        W = [self.components_]
+        n_extra = 1 if self.center and n_old > 0 else 0
+        C = np.zeros((k + n_batch + n_extra, k + (2 if self.center else 0)))
+        C[np.arange(k), np.arange(k)] = self.singular_values_
+        if self.center:
+            batch_mean = np.ravel(X.mean(axis=0))
+            W += [batch_mean[None, :], self.mean_[None, :]]
+            C[k: k + n_batch, k] = -1
+            if n_extra:
+                correction = np.sqrt(n_old * n_batch / n_total)
+                C[-1, k], C[-1, k + 1] = -correction, correction
+            self.mean_ = (n_old * self.mean_ + n_batch * batch_mean) / n_total
+        W = np.vstack(W)
+        P = sp.vstack([sp.csr_matrix((k, n_features)), X,
+                       sp.csr_matrix((n_extra, n_features))]).tocsr()
+
+        PW = np.asarray(P @ W.T)
+        G = (P @ P.T).toarray() + PW @ C.T + C @ PW.T + C @ (W @ W.T) @ C.T
+        w, U = np.linalg.eigh(G)
+        order = np.argsort(w)[::-1][:self.n_components]
+        U = U[:, order]
+        s = np.sqrt(np.clip(w[order], 0, None))
+        V = np.asarray(P.T @ U).T + (U.T @ C) @ W
+        V /= np.where(s > 0, s, 1)[:, None]
+
+        self.components_ = V
+        self.singular_values_ = s
+        self.n_samples_seen_ = n_total
+        return self
+
+    def transform(self, X):
+        X_topic = np.asarray(X @ self.components_.T)
+        if self.center:
+            X_topic -= self.mean_ @ self.components_.T
+        return X_topic
+
+
+class _CenteredSVD:
+    """
+    PCA of a sparse matrix without densifying it, the mean-centered matrix
+    X - 1 mean^T is only applied as an operator either with ARPACK (svds on
+    a LinearOperator) or with a randomized SVD (Halko et al., 2011)
+    """
+    def __init__(self, n_components=30, algorithm='arpack',
+                 n_iter=5, n_oversamples=10, random_state=None):
+        self.n_components = n_components
+        self.algorithm = algorithm
+        self.n_iter = n_iter
+        self.n_oversamples = n_oversamples
+        self.random_state = random_state
+
+    def fit_transform(self, X):
+        X = sp.csr_matrix(X)
+        n_samples, n_features = X.shape
+        self.mean_ = np.ravel(X.mean(axis=0)).astype(X.dtype)
+        mean = self.mean_
+
+        def matmat(V):
+            return X @ V - np.outer(np.ones(n_samples, dtype=X.dtype), mean @ V)
+
+        def rmatmat(U):
+            return X.T @ U - np.outer(mean, U.sum(axis=0))
+
+        random_state = check_random_state(self.random_state)
+        if self.algorithm == 'arpack':
+            operator = LinearOperator(
+                (n_samples, n_features), dtype=X.dtype,
+                matvec=lambda v: X @ v - mean @ v,
+                rmatvec=lambda u: X.T @ u - mean * u.sum(),
+                matmat=matmat, rmatmat=rmatmat
+            )
+            v0 = random_state.uniform(-1, 1, min(X.shape))
+            U, s, Vt = svds(operator, k=self.n_components, v0=v0)
+            order = np.argsort(s)[::-1]
+            U, s, Vt = U[:, order], s[order], Vt[order]
+        else:
+            Q = random_state.normal(size=(n_features, self.n_components + self.n_oversamples))
+            Q = matmat(Q.astype(X.dtype))
+            for _ in range(self.n_iter):
+                Q, _ = np.linalg.qr(Q)
+                Q, _ = np.linalg.qr(rmatmat(Q))
+                Q = matmat(Q)
+            Q, _ = np.linalg.qr(Q)
+            U, s, Vt = np.linalg.svd(rmatmat(Q).T, full_matrices=False)
+            U = Q @ U[:, :self.n_components]
+            s, Vt = s[:self.n_components], Vt[:self.n_components]
+
+        # deterministic signs, largest loading of each component is positive
+        signs = np.sign(Vt[np.arange(len(Vt)), np.argmax(np.abs(Vt), axis=1)])
+        self.components_ = Vt * signs[:, None]
+        self.singular_values_ = s
+        self.explained_variance_ = s ** 2 / max(n_samples - 1, 1)
+        return U * (s * signs)
+
+    def transform(self, X):
+        return np.asarray(X @ self.components_.T) - self.mean_ @ self.components_.T
+
+
+class TopicModel:
+    """
+    Topic model which combines a weighting scheme (vectorizer) and
+    a projection (SVD or PCA) fitted on a list of documents
+
+    Once fitted, new documents (e.g. late submissions) can be projected
+    to the same topic space with ``transform`` without refitting, and
+    the model can be saved to and loaded from disk.
+
+    Parameters
+    ----------
+    weighting: str, weighting scheme for count vector matrix
+        this can be ('count', 'tfidf', 'entropy', 'bm25', 'hashing')
+    projection: str, either 'svd' or 'pca' for topic modeling
+    n_components: int, number of topics
+    algorithm: str, either 'arpack' or 'randomized' SVD solver
+    n_iter: int, number of power iterations for 'randomized' algorithm
+    n_oversamples: int, number of extra random vectors for 'randomized' algorithm
+    dtype: numpy dtype of the weighting matrix, e.g. np.float32 to halve the memory
+    random_state: int or None, seed of the SVD solvers for reproducible topics
+    n_features: int, number of hashed features for 'hashing' weighting
+    batch_size: int, number of papers per batch for 'hashing' weighting
+
+    With 'hashing' weighting, tf-idf is computed on hashed features with
+    document frequencies accumulated batch by batch and the projection is
+    fitted incrementally, so papers can be a re-iterable or a callable that
+    returns a new generator of papers (they are read three times) and
+    only one batch is held in memory at a time.
+
+    PCA is computed on the sparse weighting matrix with implicit centering,
+    the dense document-term matrix is never built.
+
+    Example
+    -------
+    >> model = TopicModel(weighting='tfidf', projection='svd')
+    >> X_topic = model.fit_transform(papers + reviewers)
+    >> model.save('topic_model.pkl')
+    >> model = TopicModel.load('topic_model.pkl')
+    >> X_new = model.transform(new_papers)
+    """
+    def __init__(self,
+                 weighting='tfidf',
+                 projection='svd',
+                 min_df=3, max_df=0.8,
+                 lowercase=True, norm='l2',
+                 token_pattern=r'\w{1,}',
+                 ngram_range=(1, 1),
+                 n_components=30,
+                 stop_words='english',
+                 algorithm='arpack',
+                 n_iter=5,
+                 n_oversamples=10,
+                 dtype=np.float64,
+                 random_state=None,
+                 n_features=2 ** 18,
+                 batch_size=1000):
+        if weighting not in ('count', 'tfidf', 'entropy', 'bm25', 'hashing'):
+            raise ValueError("select weighting scheme from ['count', 'tfidf', 'entropy', 'bm25', 'hashing']")
+        if projection not in ('svd', 'pca'):
+            raise ValueError("select projection from ['svd', 'pca']")
+        if algorithm not in ('arpack', 'randomized'):
+            raise ValueError("select algorithm from ['arpack', 'randomized']")
+        self.weighting = weighting
+        self.projection = projection
+        self.min_df = min_df
+        self.max_df = max_df
+        self.lowercase = lowercase
+        self.norm = norm
+        self.token_pattern = token_pattern
+        self.ngram_range = ngram_range
+        self.n_components = n_components
+        self.stop_words = stop_words
+        self.algorithm = algorithm
+        self.n_iter = n_iter
+        self.n_oversamples = n_oversamples
+        self.dtype = dtype
+        self.random_state = random_state
+        self.n_features = n_features
+        self.batch_size = batch_size
+        self.vectorizer = None
+        self.topic_model = None
+
+    def _create_vectorizer(self):
+        if self.weighting == 'count':
+            return CountVectorizer(min_df=self.min_df, max_df=self.max_df,
+                                   token_pattern=self.token_pattern,
+                                   ngram_range=self.ngram_range,
+                                   stop_words=self.stop_words)
+        elif self.weighting == 'tfidf':
+            return TfidfVectorizer(min_df=self.min_df, max_df=self.max_df,
+                                   lowercase=self.lowercase, norm=self.norm,
+                                   token_pattern=self.token_pattern,
+                                   ngram_range=self.ngram_range,
+                                   use_idf=True, smooth_idf=True, sublinear_tf=True,
+                                   stop_words=self.stop_words)
+        elif self.weighting == 'entropy':
+            return LogEntropyVectorizer(min_df=self.min_df, max_df=self.max_df,
+                                        lowercase=self.lowercase,
+                                        token_pattern=self.token_pattern,
+                                        ngram_range=self.ngram_range,
+                                        stop_words=self.stop_words)
+        elif self.weighting == 'hashing':
+            return StreamingHashingVectorizer(n_features=self.n_features,
+                                              weighting='tfidf',
+                                              min_df=self.min_df, max_df=self.max_df,
+                                              lowercase=self.lowercase, norm=self.norm,
+                                              token_pattern=self.token_pattern,
+                                              ngram_range=self.ngram_range,
+                                              stop_words=self.stop_words)
+        else:
+            return BM25Vectorizer(min_df=self.min_df, max_df=self.max_df,
+                                  lowercase=self.lowercase,
+                                  token_pattern=self.token_pattern,
+                                  ngram_range=self.ngram_range,
+                                  stop_words=self.stop_words)
+
+    def fit(self, papers):
+        """
+        Fit the vectorizer and the projection on a list of ``papers``
+        """
+        self.fit_transform(papers)
+        return self
+
+    def fit_transform(self, papers):
+        """
+        Fit the model on a list of ``papers`` and return their topic vectors
+        """
+        self.vectorizer = self._create_vectorizer()
+        if self.weighting == 'hashing':
+            return self._fit_transform_batches(papers)
+        X = self.vectorizer.fit_transform(papers).astype(self.dtype) # weighting matrix
+
+        # topic modeling
+        if self.projection == 'svd':
+            self.topic_model = TruncatedSVD(n_components=self.n_components,
+                                            algorithm=self.algorithm,
+                                            n_iter=self.n_iter,
+                                            n_oversamples=self.n_oversamples,
+                                            random_state=self.random_state)
+        else:
+            self.topic_model = _CenteredSVD(n_components=self.n_components,
+                                            algorithm=self.algorithm,
+                                            n_iter=self.n_iter,
+                                            n_oversamples=self.n_oversamples,
+                                            random_state=self.random_state)
+        X_topic = self.topic_model.fit_transform(X)
+        return X_topic
+
+    def _fit_transform_batches(self, papers):
+        for batch in _iter_batches(papers, self.batch_size):
+            self.vectorizer.partial_fit(batch)
+        self.topic_model = _IncrementalSVD(n_components=self.n_components,
+                                           center=self.projection == 'pca')
+        for batch in _iter_batches(papers, self.batch_size):
+            self.topic_model.partial_fit(self.vectorizer.transform(batch))
+        return self.transform(papers)
+
+    def transform(self, papers):
+        """
+        Project a list of ``papers`` to the fitted topic space
+        """
+        if self.topic_model is None:
+            raise ValueError("TopicModel is not fitted yet, call fit first")
+        if self.weighting == 'hashing':
+            return np.vstack([self.topic_model.transform(self.vectorizer.transform(batch))
+                              for batch in _iter_batches(papers, self.batch_size)])
+        X = self.vectorizer.transform(papers).astype(self.dtype)
+        return self.topic_model.transform(X)
+
+    def save(self, path):
+        """
+        Save the fitted model to ``path``
+        """
+        if hasattr(self.vectorizer, 'stop_words_'):
+            self.vectorizer.stop_words_ = None # only kept for introspection, can be large
+        with open(path, 'wb') as f:
+            pickle.dump(self, f)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a fitted model from ``path``
+        """
+        with open(path, 'rb') as f:
+            return pickle.load(f)
@@ -1,12 +1,20 @@
 # weighting function
 # from https://github.com/titipata/science_concierge/blob/master/science_concierge/vectorizer.py
 
+from functools import partial
 import numpy as np
 import scipy.sparse as sp
 from sklearn.preprocessing import normalize
-from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
 from sklearn.utils.validation import check_is_fitted
 
+
+def _pretokenized_analyzer(doc, ngrams=None, stop_words=None, lowercase=False):
+    if lowercase:
+        doc = [token.lower() for token in doc]
+    return ngrams(doc, stop_words)
+
+
 class LogEntropyVectorizer(CountVectorizer):
     """Log-entropy vectorizer
     Convert collection of raw documents to matrix of log-entropy features
@@ -53,6 +61,15 @@ class LogEntropyVectorizer(CountVectorizer):
     norm : 'l1', 'l2' or None, optional
         Norm used to normalize term vectors. None for no normalization.
     smooth_idf: boolean, default=False
+    dtype : type, default=np.float64
+        Type of the matrix returned by fit_transform() or transform(),
+        e.g. np.float32 to halve the memory
+    pretokenized : boolean, default=False
+        If True, documents are given as lists of tokens (e.g. from
+        ``preprocess(...).split()``) and tokenization is skipped: tokens are
+        only lowercased (if ``lowercase``), filtered by ``stop_words`` and
+        combined into ``ngram_range`` n-grams. Raises ValueError with a
+        custom ``analyzer``, ``preprocessor``, ``tokenizer`` or ``token_pattern``
     See also
     --------
     CountVectorizer
@@ -78,7 +95,8 @@ class LogEntropyVectorizer(CountVectorizer):
                  analyzer='word', stop_words=None, token_pattern=r"(?u)\b\w\w+\b",
                  vocabulary=None, binary=False,
                  ngram_range=(1, 1), max_df=1.0, min_df=1,
-                 max_features=None, norm='l2', smooth_idf=False):
+                 max_features=None, norm='l2', smooth_idf=False,
+                 dtype=np.float64, pretokenized=False):
 
 
         super(LogEntropyVectorizer, self).__init__(
@@ -96,10 +114,51 @@ class LogEntropyVectorizer(CountVectorizer):
             max_features=max_features,
             vocabulary=vocabulary,
             binary=binary,
+            dtype=dtype,
         )
 
         self.norm = norm
         self.smooth_idf = smooth_idf
+        self.pretokenized = pretokenized
+
+
+    def build_analyzer(self):
+        if self.pretokenized:
+            if self.analyzer != 'word' or self.preprocessor is not None or \
+                    self.tokenizer is not None or self.token_pattern != r"(?u)\b\w\w+\b":
+                raise ValueError("pretokenized documents cannot be used with a custom "
+                                 "analyzer, preprocessor, tokenizer or token_pattern")
+            return partial(_pretokenized_analyzer, ngrams=self._word_ngrams,
+                           stop_words=self.get_stop_words(), lowercase=self.lowercase)
+        return super(LogEntropyVectorizer, self).build_analyzer()
+
+
+    def _fit_global_weights(self, X):
+        """Compute global entropy weights from count matrix X (CSR)
+        using only X.data and X.indices, without copying X
+        """
+        n_samples, n_features = X.shape
+        gf = np.bincount(X.indices, weights=X.data, minlength=n_features) # count total number of each words
+
+        if self.smooth_idf:
+            n_samples += int(self.smooth_idf)
+            gf += int(self.smooth_idf)
+
+        p = X.data / gf[X.indices] # probability of word occurence
+        entropy = np.bincount(X.indices, weights=p * np.log2(p), minlength=n_features)
+        g = 1 + entropy / np.log2(n_samples)
+        # global weights
+        self._G = sp.spdiags(g, diags=0, m=n_features, n=n_features)
+        return g
+
+
+    def _apply_global_weights(self, X, g):
+        """Multiply count matrix X by global weights in place and normalize
+        """
+        X.data *= g[X.indices].astype(X.dtype, copy=False) # sparse entropy matrix
+        if self.norm is not None:
+            X = normalize(X, norm=self.norm, copy=False)
+        return X
 
 
     def fit(self, raw_documents, y=None):
@@ -107,44 +166,30 @@ class LogEntropyVectorizer(CountVectorizer):
         Parameters
         ----------
         raw_documents : iterable
-            an iterable which yields either str, unicode or file objects
+            an iterable which yields either str, unicode or file objects,
+            or lists of tokens if ``pretokenized`` is True
         Returns
         -------
         self : LogEntropyVectorizer
         """
         X = super(LogEntropyVectorizer, self).fit_transform(raw_documents)
-
-        n_samples, n_features = X.shape
-        gf = np.ravel(X.sum(axis=0)) # count total number of each words
-
-        if self.smooth_idf:
-            n_samples += int(self.smooth_idf)
-            gf += int(self.smooth_idf)
-
-        P = (X * sp.spdiags(1./gf, diags=0, m=n_features, n=n_features)) # probability of word occurence
-        p = P.data
-        P.data = (p * np.log2(p) / np.log2(n_samples))
-        g = 1 + np.ravel(P.sum(axis=0))
-        f = np.log2(1 + X.data)
-        X.data = f
-        # global weights
-        self._G = sp.spdiags(g, diags=0, m=n_features, n=n_features)
+        self._fit_global_weights(X)
         return self
 
 
     def fit_transform(self, raw_documents, y=None):
-        self.fit(raw_documents)
-        return self.transform(raw_documents)
+        """Learn vocabulary and log-entropy and return the weighted matrix,
+        documents are tokenized and counted only once
+        """
+        X = super(LogEntropyVectorizer, self).fit_transform(raw_documents)
+        g = self._fit_global_weights(X)
+        return self._apply_global_weights(X, g)
 
 
     def transform(self, raw_documents):
+        check_is_fitted(self, '_G', msg='global weight vector is not fitted')
         X = super(LogEntropyVectorizer, self).transform(raw_documents)
-        check_is_fitted(self, '_G', 'global weight vector is not fitted')
-        L = X * self._G  # sparse entropy matrix
-
-        if self.norm is not None:
-            L = normalize(L, norm=self.norm, copy=False)
-        return L
+        return self._apply_global_weights(X, self._G.diagonal())
 
 
 class BM25Vectorizer(CountVectorizer):
@@ -210,14 +255,201 @@ class BM25Vectorizer(CountVectorizer):
         self.b = b
         self.k1 = k1
 
-    def fit_transform(self, raw_documents, y=None):
+    def _reset_statistics(self, n_features):
+        self.n_samples_ = 0
+        self.total_len_ = 0.0
+        self.df_ = np.zeros(n_features, dtype=np.int64)
 
-        X = super(BM25Vectorizer, self).fit_transform(raw_documents)
-        X = X.tocoo()
+
+    def _update_statistics(self, X):
+        """Accumulate collection statistics from count matrix X (CSR)
+        """
         n_samples, n_features = X.shape
+        if len(self.df_) < n_features:
+            self.df_ = np.concatenate([self.df_, np.zeros(n_features - len(self.df_), dtype=np.int64)])
+        self.n_samples_ += n_samples
+        self.total_len_ += float(X.sum())
+        self.df_ += np.bincount(X.indices, minlength=n_features)
+
+
+    @property
+    def avg_len_(self):
+        """Average document length of the fitted collection"""
+        return self.total_len_ / self.n_samples_
+
+
+    @property
+    def idf_(self):
+        """Inverse document frequency of each term in the fitted collection"""
+        return np.log(float(self.n_samples_) / (1 + self.df_))
+
+
+    def _weight(self, X):
+        """Okapi BM25 weighting of count matrix X (CSR) in place
+        using the fitted collection statistics
+        """
+        X = X.astype(np.float64, copy=False)
         doc_len = np.ravel(X.sum(axis=1))
-        avg_len = doc_len.mean()
-        len_norm = 1.0 - self.b + (self.b * doc_len / avg_len)
-        idf = np.log(float(n_samples) / (1 + np.bincount(X.col)))
-        X.data = X.data * (self.k1 + 1.0) / (self.k1 * len_norm[X.row] + X.data) * idf[X.col]
-        return X.tocsr()
+        len_norm = 1.0 - self.b + (self.b * doc_len / self.avg_len_)
+        rows = np.repeat(np.arange(X.shape[0]), np.diff(X.indptr))
+        X.data = X.data * (self.k1 + 1.0) / (self.k1 * len_norm[rows] + X.data) * self.idf_[X.indices]
+        return X
+
+
+    def fit(self, raw_documents, y=None):
+        """Learn vocabulary, document frequencies and average document length
+        """
+        X = super(BM25Vectorizer, self).fit_transform(raw_documents)
+        self._reset_statistics(X.shape[1])
+        self._update_statistics(X)
+        self.grow_vocabulary_ = False
+        return self
+
+
+    def fit_transform(self, raw_documents, y=None):
+        X = super(BM25Vectorizer, self).fit_transform(raw_documents)
+        self._reset_statistics(X.shape[1])
+        self._update_statistics(X)
+        self.grow_vocabulary_ = False
+        return self._weight(X)
+
+
+    def partial_fit(self, raw_documents, y=None):
+        """Update vocabulary and collection statistics with a batch of documents
+
+        The vocabulary grows with each batch, unless a fixed ``vocabulary``
+        is given, so ``min_df``, ``max_df`` and ``max_features`` are not
+        applied (the final document frequencies are only known at the end).
+        After ``fit``, the fitted vocabulary is frozen: only the statistics
+        of its terms are updated, so terms pruned by ``min_df``, ``max_df``
+        or ``max_features`` are not added back.
+        """
+        if not hasattr(self, 'vocabulary_'):
+            self._validate_vocabulary()
+            if not self.fixed_vocabulary_:
+                self.vocabulary_ = {}
+            self._reset_statistics(len(self.vocabulary_))
+            self.grow_vocabulary_ = not self.fixed_vocabulary_
+        analyze = self.build_analyzer()
+        vocabulary = self.vocabulary_
+        grow = self.grow_vocabulary_
+
+        j_indices, indptr = [], [0]
+        for doc in raw_documents:
+            for term in analyze(doc):
+                if grow:
+                    j_indices.append(vocabulary.setdefault(term, len(vocabulary)))
+                elif term in vocabulary:
+                    j_indices.append(vocabulary[term])
+            indptr.append(len(j_indices))
+
+        X = sp.csr_matrix((np.ones(len(j_indices), dtype=np.int64), j_indices, indptr),
+                          shape=(len(indptr) - 1, len(vocabulary)))
+        X.sum_duplicates()
+        if self.binary:
+            X.data.fill(1)
+        self._update_statistics(X)
+        return self
+
+
+    def transform(self, raw_documents):
+        """Score new documents against the fitted collection statistics
+        """
+        check_is_fitted(self, 'df_', msg='BM25 statistics are not fitted')
+        X = super(BM25Vectorizer, self).transform(raw_documents)
+        return self._weight(X)
+
+
+class StreamingHashingVectorizer:
+    """
+    Out-of-core tf-idf or log-entropy weighting with feature hashing
+
+    Documents are mapped to ``n_features`` columns with scikit-learn
+    HashingVectorizer so no vocabulary has to be kept in memory. Document
+    frequencies (and the global statistics for entropy) are accumulated
+    batch by batch with ``partial_fit`` and applied in ``transform``.
+    ``min_df`` and ``max_df`` are applied on the accumulated document
+    frequencies, terms outside the range get zero weight.
+
+    Parameters
+    ----------
+    n_features : int, default=2 ** 18
+        Number of hashed features (columns)
+    weighting : 'tfidf' or 'entropy', default='tfidf'
+        'tfidf' uses sublinear tf and smoothed idf as ``TfidfVectorizer``,
+        'entropy' uses the global weights of ``LogEntropyVectorizer``
+    min_df : float in range [0, 1] or int, default=1
+    max_df : float in range [0, 1] or int, default=1.0
+    norm : 'l1', 'l2' or None, optional
+        Norm used to normalize term vectors. None for no normalization.
+    dtype : type, default=np.float32
+        Type of the matrix returned by transform()
+    lowercase, stop_words, token_pattern, ngram_range, analyzer :
+        see HashingVectorizer
+    """
+    def __init__(self, n_features=2 ** 18, weighting='tfidf',
+                 min_df=1, max_df=1.0, norm='l2',
+                 lowercase=True, stop_words=None, token_pattern=r"(?u)\b\w\w+\b",
+                 ngram_range=(1, 1), analyzer='word', dtype=np.float32):
+        if weighting not in ('tfidf', 'entropy'):
+            raise ValueError("select weighting scheme from ['tfidf', 'entropy']")
+        self.n_features = n_features
+        self.weighting = weighting
+        self.min_df = min_df
+        self.max_df = max_df
+        self.norm = norm
+        self.dtype = dtype
+        self.hasher = HashingVectorizer(n_features=n_features, lowercase=lowercase,
+                                        stop_words=stop_words, token_pattern=token_pattern,
+                                        ngram_range=ngram_range, analyzer=analyzer,
+                                        norm=None, alternate_sign=False, dtype=np.float64)
+        self.n_samples_ = 0
+        self.df_ = np.zeros(n_features, dtype=np.int64)
+        self.gf_ = np.zeros(n_features)
+        self.clogc_ = np.zeros(n_features)
+
+
+    def partial_fit(self, raw_documents, y=None):
+        """Accumulate document frequencies from a batch of documents
+        """
+        X = self.hasher.transform(raw_documents)
+        self.n_samples_ += X.shape[0]
+        self.df_ += np.bincount(X.indices, minlength=self.n_features)
+        if self.weighting == 'entropy':
+            self.gf_ += np.bincount(X.indices, weights=X.data, minlength=self.n_features)
+            self.clogc_ += np.bincount(X.indices, weights=X.data * np.log2(X.data),
+                                       minlength=self.n_features)
+        return self
+
+
+    def global_weights(self):
+        """Global weight of each hashed feature from the accumulated statistics
+        """
+        n_samples = self.n_samples_
+        if self.weighting == 'tfidf':
+            g = np.log((1.0 + n_samples) / (1.0 + self.df_)) + 1.0
+        else:
+            # sum_d p log p with p = c / gf is sum_d c log c / gf - log gf
+            with np.errstate(divide='ignore', invalid='ignore'):
+                entropy = self.clogc_ / self.gf_ - np.log2(self.gf_)
+            g = 1 + np.nan_to_num(entropy) / np.log2(max(n_samples, 2))
+        min_df = self.min_df if isinstance(self.min_df, (int, np.integer)) else self.min_df * n_samples
+        max_df = self.max_df if isinstance(self.max_df, (int, np.integer)) else self.max_df * n_samples
+        g[(self.df_ < min_df) | (self.df_ > max_df) | (self.df_ == 0)] = 0
+        return g
+
+
+    def transform(self, raw_documents):
+        """Weighted hashed term matrix of a batch of documents
+        """
+        if self.n_samples_ == 0:
+            raise ValueError("document frequencies are not fitted, call partial_fit first")
+        X = self.hasher.transform(raw_documents)
+        if self.weighting == 'tfidf':
+            X.data = 1.0 + np.log(X.data) # sublinear tf
+        X.data *= self.global_weights()[X.indices]
+        X.eliminate_zeros()
+        X = X.astype(self.dtype)
+        if self.norm is not None:
+            X = normalize(X, norm=self.norm, copy=False)
+        return X